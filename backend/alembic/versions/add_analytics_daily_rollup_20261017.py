@@ -0,0 +1,43 @@
+"""Add analytics_daily_rollup table for precomputed report totals
+
+Revision ID: add_daily_rollup_20261017
+Revises: add_stripe_fields_20260119
+Create Date: 2026-10-17 02:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_daily_rollup_20261017'
+down_revision: Union[str, Sequence[str], None] = 'add_stripe_fields_20260119'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the nightly analytics rollup table."""
+    op.create_table('analytics_daily_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('new_users', sa.Integer(), nullable=False),
+        sa.Column('jobs', sa.Integer(), nullable=False),
+        sa.Column('completed_jobs', sa.Integer(), nullable=False),
+        sa.Column('photos', sa.Integer(), nullable=False),
+        sa.Column('total_detections', sa.Integer(), nullable=False),
+        sa.Column('correct_detections', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_analytics_daily_rollup_id'), 'analytics_daily_rollup', ['id'], unique=False)
+    op.create_index(op.f('ix_analytics_daily_rollup_date'), 'analytics_daily_rollup', ['date'], unique=True)
+
+
+def downgrade() -> None:
+    """Drop the nightly analytics rollup table."""
+    op.drop_index(op.f('ix_analytics_daily_rollup_date'), table_name='analytics_daily_rollup')
+    op.drop_index(op.f('ix_analytics_daily_rollup_id'), table_name='analytics_daily_rollup')
+    op.drop_table('analytics_daily_rollup')
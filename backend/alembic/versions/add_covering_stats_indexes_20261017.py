@@ -0,0 +1,54 @@
+"""Cover the per-user stats queries and add an action_type/created_at index
+
+Revision ID: add_stats_indexes_20261017
+Revises: add_usage_hourly_rollup_20261017
+Create Date: 2026-10-17 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_stats_indexes_20261017'
+down_revision: Union[str, Sequence[str], None] = 'add_usage_hourly_rollup_20261017'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns, INCLUDE columns); other dialects ignore INCLUDE
+COVERING_INDEXES = [
+    ('ix_usage_logs_user_created', 'usage_logs', ['user_id', 'created_at'],
+     ['action_type', 'photo_count', 'success', 'file_size_mb']),
+    ('ix_processing_jobs_user_created', 'processing_jobs', ['user_id', 'created_at'],
+     ['status', 'total_processing_time_seconds', 'total_photos']),
+]
+ACTION_CREATED_INDEX = ('ix_usage_logs_action_created', 'usage_logs', ['action_type', 'created_at'],
+                        ['photo_count', 'success'])
+
+
+def upgrade() -> None:
+    """Rebuild the per-user indexes with INCLUDE columns and add the action index."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction. Each statement
+    # commits on its own, so they are written to be safe to re-run if the
+    # revision stamp fails after them.
+    with op.get_context().autocommit_block():
+        for name, table, columns, include in COVERING_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+            op.create_index(name, table, columns, unique=False, if_not_exists=True,
+                            postgresql_include=include, postgresql_concurrently=True)
+
+        name, table, columns, include = ACTION_CREATED_INDEX
+        op.create_index(name, table, columns, unique=False, if_not_exists=True,
+                        postgresql_include=include, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Drop the action index and restore the plain per-user indexes."""
+    with op.get_context().autocommit_block():
+        name, table, _, _ = ACTION_CREATED_INDEX
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+        for name, table, columns, _ in COVERING_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+            op.create_index(name, table, columns, unique=False, if_not_exists=True,
+                            postgresql_concurrently=True)
@@ -0,0 +1,47 @@
+"""Add processing_jobs indexes for job listing, expiry cleanup and recovery
+
+Revision ID: add_job_lookup_indexes_20261017
+Revises: add_report_indexes_20261017
+Create Date: 2026-10-17 05:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_job_lookup_indexes_20261017'
+down_revision: Union[str, Sequence[str], None] = 'add_report_indexes_20261017'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, columns, partial-index predicate)
+JOB_INDEXES = [
+    ('ix_processing_jobs_user_created', ['user_id', 'created_at'], None),
+    ('ix_processing_jobs_expires_at', ['expires_at'], 'expires_at IS NOT NULL'),
+    ('ix_processing_jobs_status_started', ['status', 'started_at'], None),
+]
+
+
+def upgrade() -> None:
+    """Build the indexes concurrently so processing_jobs stays writable."""
+    # photos.processing_job_id is already covered by idx_photos_processing_job_id
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, columns, where in JOB_INDEXES:
+            op.create_index(
+                name,
+                'processing_jobs',
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+            )
+
+
+def downgrade() -> None:
+    """Drop the job lookup indexes."""
+    with op.get_context().autocommit_block():
+        for name, _, _ in JOB_INDEXES:
+            op.drop_index(name, table_name='processing_jobs', postgresql_concurrently=True)
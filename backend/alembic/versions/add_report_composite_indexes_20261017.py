@@ -0,0 +1,38 @@
+"""Add composite indexes behind the date-filtered report aggregates
+
+Revision ID: add_report_indexes_20261017
+Revises: add_daily_rollup_20261017
+Create Date: 2026-10-17 04:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_report_indexes_20261017'
+down_revision: Union[str, Sequence[str], None] = 'add_daily_rollup_20261017'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns)
+REPORT_INDEXES = [
+    ('ix_processing_jobs_created_status', 'processing_jobs', ['created_at', 'status']),
+    ('ix_usage_logs_user_created', 'usage_logs', ['user_id', 'created_at']),
+    ('ix_detection_accuracy_logs_detected_correct', 'detection_accuracy_logs', ['detected_at', 'is_correct']),
+]
+
+
+def upgrade() -> None:
+    """Build the indexes concurrently so production tables stay writable."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in REPORT_INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Drop the report indexes."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in REPORT_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,50 @@
+"""Add stripe_webhook_events table for webhook idempotency
+
+Revision ID: add_webhook_events_20261017
+Revises: add_job_lookup_indexes_20261017
+Create Date: 2026-10-17 06:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_webhook_events_20261017'
+down_revision: Union[str, Sequence[str], None] = 'add_job_lookup_indexes_20261017'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the Stripe webhook event log."""
+    op.create_table('stripe_webhook_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.String(length=255), nullable=False),
+        sa.Column('event_type', sa.String(length=100), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('received_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stripe_webhook_events_id'), 'stripe_webhook_events', ['id'], unique=False)
+    op.create_index(op.f('ix_stripe_webhook_events_event_id'), 'stripe_webhook_events', ['event_id'], unique=True)
+    op.create_index(
+        'ix_stripe_webhook_events_unprocessed',
+        'stripe_webhook_events',
+        ['received_at'],
+        unique=False,
+        postgresql_where=sa.text('processed_at IS NULL'),
+        sqlite_where=sa.text('processed_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Drop the Stripe webhook event log."""
+    op.drop_index('ix_stripe_webhook_events_unprocessed', table_name='stripe_webhook_events')
+    op.drop_index(op.f('ix_stripe_webhook_events_event_id'), table_name='stripe_webhook_events')
+    op.drop_index(op.f('ix_stripe_webhook_events_id'), table_name='stripe_webhook_events')
+    op.drop_table('stripe_webhook_events')
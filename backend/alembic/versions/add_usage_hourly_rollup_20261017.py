@@ -0,0 +1,43 @@
+"""Add usage_hourly_rollup table for hour-of-day usage stats
+
+Revision ID: add_usage_hourly_rollup_20261017
+Revises: add_webhook_events_20261017
+Create Date: 2026-10-17 07:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_usage_hourly_rollup_20261017'
+down_revision: Union[str, Sequence[str], None] = 'add_webhook_events_20261017'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the hourly usage rollup table."""
+    op.create_table('usage_hourly_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('hour_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('action_type', sa.String(length=20), nullable=False),
+        sa.Column('success', sa.Boolean(), nullable=False),
+        sa.Column('actions', sa.Integer(), nullable=False),
+        sa.Column('photos', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'hour_start', 'action_type', 'success', name='uq_usage_hourly_rollup_bucket')
+    )
+    op.create_index(op.f('ix_usage_hourly_rollup_id'), 'usage_hourly_rollup', ['id'], unique=False)
+    op.create_index('ix_usage_hourly_rollup_hour_start', 'usage_hourly_rollup', ['hour_start'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the hourly usage rollup table."""
+    op.drop_index('ix_usage_hourly_rollup_hour_start', table_name='usage_hourly_rollup')
+    op.drop_index(op.f('ix_usage_hourly_rollup_id'), table_name='usage_hourly_rollup')
+    op.drop_table('usage_hourly_rollup')
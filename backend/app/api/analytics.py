@@ -3,10 +3,11 @@ Analytics and Business Intelligence API endpoints.
 """
 
 import logging
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Union
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy import desc, func, Boolean
 from sqlalchemy.orm import Session
 
@@ -29,6 +30,16 @@ from database import get_db
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Export format -> (media type, file extension) for download responses
+EXPORT_CONTENT_TYPES = {
+    "json": ("application/json", "json"),
+    "csv": ("text/csv", "csv"),
+    "excel": (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "xlsx",
+    ),
+}
+
 @router.get("/daily-metrics")
 async def get_daily_metrics(
     days: int = Query(30, description="Number of days to analyze"),
@@ -427,7 +438,7 @@ async def get_conversion_funnel(
 
 @router.get("/admin/export/analytics-report")
 async def export_analytics_report(
-    format: str = Query("json", description="Export format: json, csv"),
+    format: str = Query("json", description="Export format: json, csv, excel"),
     days: int = Query(30, description="Number of days to include"),
     admin_user: User = Depends(require_admin),
     db: Session = Depends(get_db),
@@ -440,22 +451,7 @@ async def export_analytics_report(
         # Use the enhanced export service
         report_data = await export_service.export_business_report(db, format, days)
 
-        if format.lower() == "csv":
-            return Response(
-                content=report_data,
-                media_type="text/csv",
-                headers={
-                    "Content-Disposition": f"attachment; filename=business_report_{datetime.utcnow().strftime('%Y%m%d')}.csv"
-                },
-            )
-        else:
-            return Response(
-                content=report_data,
-                media_type="application/json",
-                headers={
-                    "Content-Disposition": f"attachment; filename=business_report_{datetime.utcnow().strftime('%Y%m%d')}.json"
-                },
-            )
+        return _export_response(report_data, format, "business_report")
 
     except Exception as e:
         logger.error(f"Export failed: {e}")
@@ -464,7 +460,7 @@ async def export_analytics_report(
 
 @router.get("/admin/export/user-analytics")
 async def export_user_analytics(
-    format: str = Query("csv", description="Export format: json, csv"),
+    format: str = Query("csv", description="Export format: json, csv, excel"),
     days: int = Query(30, description="Number of days to include"),
     include_engagement: bool = Query(True, description="Include engagement metrics"),
     admin_user: User = Depends(require_admin),
@@ -479,16 +475,7 @@ async def export_user_analytics(
             db, format, days, include_engagement
         )
 
-        media_type = "text/csv" if format.lower() == "csv" else "application/json"
-        filename = (
-            f"user_analytics_{datetime.utcnow().strftime('%Y%m%d')}.{format.lower()}"
-        )
-
-        return Response(
-            content=export_data,
-            media_type=media_type,
-            headers={"Content-Disposition": f"attachment; filename={filename}"},
-        )
+        return _export_response(export_data, format, "user_analytics")
 
     except Exception as e:
         logger.error(f"User analytics export failed: {e}")
@@ -497,7 +484,7 @@ async def export_user_analytics(
 
 @router.get("/admin/export/conversion-funnel")
 async def export_conversion_funnel(
-    format: str = Query("csv", description="Export format: json, csv"),
+    format: str = Query("csv", description="Export format: json, csv, excel"),
     days: int = Query(30, description="Number of days to include"),
     admin_user: User = Depends(require_admin),
     db: Session = Depends(get_db),
@@ -509,16 +496,7 @@ async def export_conversion_funnel(
     try:
         export_data = await export_service.export_conversion_funnel(db, format, days)
 
-        media_type = "text/csv" if format.lower() == "csv" else "application/json"
-        filename = (
-            f"conversion_funnel_{datetime.utcnow().strftime('%Y%m%d')}.{format.lower()}"
-        )
-
-        return Response(
-            content=export_data,
-            media_type=media_type,
-            headers={"Content-Disposition": f"attachment; filename={filename}"},
-        )
+        return _export_response(export_data, format, "conversion_funnel")
 
     except Exception as e:
         logger.error(f"Conversion funnel export failed: {e}")
@@ -527,7 +505,7 @@ async def export_conversion_funnel(
 
 @router.get("/admin/export/detection-accuracy")
 async def export_detection_accuracy(
-    format: str = Query("csv", description="Export format: json, csv"),
+    format: str = Query("csv", description="Export format: json, csv, excel"),
     days: int = Query(30, description="Number of days to include"),
     admin_user: User = Depends(require_admin),
     db: Session = Depends(get_db),
@@ -541,14 +519,7 @@ async def export_detection_accuracy(
             db, format, days
         )
 
-        media_type = "text/csv" if format.lower() == "csv" else "application/json"
-        filename = f"detection_accuracy_{datetime.utcnow().strftime('%Y%m%d')}.{format.lower()}"
-
-        return Response(
-            content=export_data,
-            media_type=media_type,
-            headers={"Content-Disposition": f"attachment; filename={filename}"},
-        )
+        return _export_response(export_data, format, "detection_accuracy")
 
     except Exception as e:
         logger.error(f"Detection accuracy export failed: {e}")
@@ -669,3 +640,15 @@ def get_processing_performance_metrics(db: Session, days: int) -> Dict[str, Any]
 # use stripe to get revenue metrics
 
 
+def _export_response(
+    content: Union[bytes, Iterator[bytes]], format: str, filename_prefix: str
+) -> Response:
+    """Wrap export output in a download response, streaming chunked CSV output."""
+    media_type, extension = EXPORT_CONTENT_TYPES.get(
+        format.lower(), EXPORT_CONTENT_TYPES["json"]
+    )
+    filename = f"{filename_prefix}_{datetime.now(timezone.utc).strftime('%Y%m%d')}.{extension}"
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if isinstance(content, bytes):
+        return Response(content=content, media_type=media_type, headers=headers)
+    return StreamingResponse(content, media_type=media_type, headers=headers)
@@ -7,8 +7,8 @@ import logging
 
 # Import the Stripe service functions
 from app.services.stripe_service import (
-    create_checkout_session,
-    create_billing_portal_session,
+    create_checkout_session_async,
+    create_billing_portal_session_async,
     handle_webhook_event
 )
 # Import security components (assuming payment requires authentication)
@@ -77,7 +77,7 @@ async def handle_create_checkout_session(
         f"Tier: {request_data.tier_name}"
     )
 
-    session_url, error_message = create_checkout_session(
+    session_url, error_message = await create_checkout_session_async(
         db=db,
         tier_name=request_data.tier_name,
         user=current_user,
@@ -123,7 +123,7 @@ async def handle_billing_portal(
     if not validate_redirect_url(request_data.return_url):
         raise HTTPException(status_code=400, detail="Invalid return_url domain")
 
-    portal_url, error_message = create_billing_portal_session(
+    portal_url, error_message = await create_billing_portal_session_async(
         user=current_user,
         return_url=request_data.return_url
     )
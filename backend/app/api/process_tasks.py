@@ -155,7 +155,7 @@ async def start_processing_with_tasks(
     jobs[job_id] = {"job": job, "user_id": current_user.id}
 
     # 2. Create DB record (use total_photos which includes expected_total for progressive processing)
-    usage_tracker.create_processing_job(
+    processing_job_record = usage_tracker.create_processing_job(
         db=db, user_id=current_user.id, job_id=job_id, total_photos=total_photos,
         started_at=request.upload_started_at  # Full user experience timing from button click
     )
@@ -163,14 +163,8 @@ async def start_processing_with_tasks(
     # 3. CRITICAL: Link existing PhotoDB records to the processing job
     # This allows the worker to find them when updating progress
     from app.models.processing import PhotoDB
-    from app.models.usage import ProcessingJob as ProcessingJobDB
-    
-    # Get the INTEGER primary key for this job_id 
-    processing_job_record = db.query(ProcessingJobDB).filter(
-        ProcessingJobDB.job_id == job_id,
-        ProcessingJobDB.user_id == current_user.id
-    ).first()
-    
+
+    # create_processing_job returns the refreshed row, so its INTEGER primary key is loaded
     if processing_job_record:
         # Use the INTEGER primary key instead of UUID string
         db.query(PhotoDB).filter(
@@ -1,4 +1,5 @@
 import logging
+from typing import Any, Mapping
 from fastapi import APIRouter
 from app.services.tier_service import TIER_CONFIGS
 
@@ -33,7 +34,7 @@ async def get_tiers():
     return frontend_tiers
 
 
-def transform_features(tier_name: str, config: dict) -> list:
+def transform_features(tier_name: str, config: Mapping[str, Any]) -> list:
     """
     Transform backend feature codes to structured frontend data.
     Returns structured objects that frontend formats (no HTML in API responses).
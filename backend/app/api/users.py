@@ -1,3 +1,4 @@
+import asyncio
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
@@ -20,7 +21,7 @@ async def get_my_usage_stats(
 ):
     """Get detailed usage statistics for the current user."""
 
-    stats = analytics_service.get_user_stats(db, current_user.id, days)
+    stats = await asyncio.to_thread(analytics_service.get_user_stats, db, current_user.id, days)
 
     return {
         "user": current_user.to_dict(),
@@ -37,7 +38,7 @@ async def get_my_quota(
 ):
     """Get current user's quota information."""
 
-    quota = usage_tracker.get_or_create_user_quota(db, current_user.id)
+    quota = await asyncio.to_thread(usage_tracker.get_or_create_user_quota, db, current_user.id)
 
     return {
         "user_id": current_user.id,
@@ -54,7 +55,9 @@ async def get_my_activity_timeline(
 ):
     """Get activity timeline for the current user."""
 
-    timeline = analytics_service.get_user_activity_timeline(db, current_user.id, days)
+    timeline = await asyncio.to_thread(
+        analytics_service.get_user_activity_timeline, db, current_user.id, days
+    )
 
     return {
         "user_id": current_user.id,
@@ -250,7 +253,7 @@ async def get_system_stats(
 ):
     """Get system-wide usage statistics. ADMIN ONLY."""
 
-    stats = usage_tracker.get_system_stats(db, days)
+    stats = await asyncio.to_thread(usage_tracker.get_system_stats, db, days)
 
     return {"stats": stats, "message": f"System statistics for the last {days} days"}
 
@@ -263,7 +266,9 @@ async def get_popular_hours(
 ):
     """Get usage statistics by hour of day."""
 
-    hour_stats = analytics_service.get_popular_hours(db, current_user.id, days)  # SECURITY: User-scoped only
+    hour_stats = await asyncio.to_thread(
+        analytics_service.get_popular_hours, db, current_user.id, days  # SECURITY: User-scoped only
+    )
 
     # Convert to more readable format
     hourly_data = [
@@ -3,7 +3,7 @@ Optimized Analytics Models: Focused on ML Accuracy and Business KPIs.
 """
 from enum import Enum
 
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -47,6 +47,10 @@ class DetectionAccuracyLog(Base):
     This links AI guesses to human corrections.
     """
     __tablename__ = "detection_accuracy_logs"
+    __table_args__ = (
+        # Accuracy totals over a date range without touching the heap
+        Index("ix_detection_accuracy_logs_detected_correct", "detected_at", "is_correct"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     photo_id = Column(String(36), nullable=False, index=True)
@@ -78,4 +82,45 @@ class UserRetentionCohort(Base):
     month_6 = Column(Float)
     month_12 = Column(Float)
 
-    last_updated = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    last_updated = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class AnalyticsDailyRollup(Base):
+    """
+    Nightly per-day totals so business reports sum a few rows
+    instead of re-aggregating the raw tables on every request.
+    """
+    __tablename__ = "analytics_daily_rollup"
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Date, nullable=False, unique=True, index=True)
+
+    new_users = Column(Integer, default=0, nullable=False)
+    jobs = Column(Integer, default=0, nullable=False)
+    completed_jobs = Column(Integer, default=0, nullable=False)
+    photos = Column(Integer, default=0, nullable=False)
+    total_detections = Column(Integer, default=0, nullable=False)
+    correct_detections = Column(Integer, default=0, nullable=False)
+
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class UsageHourlyRollup(Base):
+    """
+    Usage log counts per user, hour and action, refreshed every few minutes
+    so hour-of-day stats scan a few rows per active hour instead of every log.
+    """
+    __tablename__ = "usage_hourly_rollup"
+    __table_args__ = (
+        UniqueConstraint("user_id", "hour_start", "action_type", "success", name="uq_usage_hourly_rollup_bucket"),
+        Index("ix_usage_hourly_rollup_hour_start", "hour_start"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    hour_start = Column(DateTime(timezone=True), nullable=False)  # UTC, truncated to the hour
+    action_type = Column(String(20), nullable=False)  # ActionType value
+    success = Column(Boolean, nullable=False)
+
+    actions = Column(Integer, default=0, nullable=False)
+    photos = Column(Integer, default=0, nullable=False)
@@ -8,7 +8,7 @@ from typing import Any, Dict, List, Optional
 
 from sqlalchemy import JSON, Boolean, Column, DateTime
 from sqlalchemy import Enum as SQLEnum
-from sqlalchemy import Float, ForeignKey, Integer, String, Text
+from sqlalchemy import Float, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -43,7 +43,10 @@ class PhotoDB(Base):
     """
 
     __tablename__ = "photos"
-
+    __table_args__ = (
+        # Job photo lookups; same name as the index created by the migrations
+        Index("idx_photos_processing_job_id", "processing_job_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     photo_id = Column(String(36), unique=True, index=True, nullable=False)  # UUID
@@ -9,12 +9,13 @@ from sqlalchemy import (
     Enum,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
 )
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 
 from database import Base
 
@@ -41,6 +42,23 @@ class UsageLog(Base):
     """
 
     __tablename__ = "usage_logs"
+    __table_args__ = (
+        # Per-user activity counts over a date range; the included columns
+        # let per-user stats aggregate from the index alone on Postgres
+        Index(
+            "ix_usage_logs_user_created",
+            "user_id",
+            "created_at",
+            postgresql_include=["action_type", "photo_count", "success", "file_size_mb"],
+        ),
+        # System-wide counts of one action over a date range
+        Index(
+            "ix_usage_logs_action_created",
+            "action_type",
+            "created_at",
+            postgresql_include=["photo_count", "success"],
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False, index=True)  # Foreign key to users.id
@@ -90,6 +108,28 @@ class ProcessingJob(Base):
     """
 
     __tablename__ = "processing_jobs"
+    __table_args__ = (
+        # Date-filtered job counts split by status; also serves plain
+        # created_at range scans through its leading column
+        Index("ix_processing_jobs_created_status", "created_at", "status"),
+        # Per-user job listing, newest first (scanned backwards), and per-user
+        # job stats without heap fetches on Postgres
+        Index(
+            "ix_processing_jobs_user_created",
+            "user_id",
+            "created_at",
+            postgresql_include=["status", "total_processing_time_seconds", "total_photos"],
+        ),
+        # Expiry cleanup only ever looks at jobs that have an expiry
+        Index(
+            "ix_processing_jobs_expires_at",
+            "expires_at",
+            postgresql_where=text("expires_at IS NOT NULL"),
+            sqlite_where=text("expires_at IS NOT NULL"),
+        ),
+        # Stalled-job recovery by status and start time
+        Index("ix_processing_jobs_status_started", "status", "started_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
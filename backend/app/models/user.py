@@ -1,9 +1,9 @@
 from datetime import datetime, timezone
 
 import bcrypt
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.orm import relationship, validates
+from sqlalchemy.sql import func, text
 
 from app.core.security_config import BCRYPT_ROUNDS
 from database import Base
@@ -71,6 +71,13 @@ class User(Base):
         "PasswordResetToken", back_populates="user", cascade="all, delete-orphan"
     )
 
+    @validates("tier_expiry_date")
+    def _normalize_tier_expiry_date(self, key, value):
+        """Store tier expiry as aware UTC so every writer keeps the column consistent."""
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
     def set_password(self, password: str) -> None:
         """
         Hash and set the user's password using bcrypt with cost factor 12.
@@ -255,3 +262,35 @@ class PasswordResetToken(Base):
 
     def __repr__(self) -> str:
         return f"<PasswordResetToken(id={self.id}, user_id={self.user_id}, used={self.is_used})>"
+
+
+class StripeWebhookEvent(Base):
+    """
+    Stripe webhook events that have been accepted for processing.
+    The unique event_id makes redelivered events cheap to recognise, and the
+    stored payload lets unprocessed events be retried after a failure or restart.
+    """
+
+    __tablename__ = "stripe_webhook_events"
+    __table_args__ = (
+        # Retry sweep only ever looks at events that haven't been applied
+        Index(
+            "ix_stripe_webhook_events_unprocessed",
+            "received_at",
+            postgresql_where=text("processed_at IS NULL"),
+            sqlite_where=text("processed_at IS NULL"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(String(255), unique=True, index=True, nullable=False)
+    event_type = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False)  # Raw event body as received
+    attempts = Column(Integer, default=0, nullable=False)
+    received_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<StripeWebhookEvent(event_id='{self.event_id}', type='{self.event_type}')>"
@@ -2,17 +2,21 @@
 Analytics service for performance-first business intelligence.
 """
 import logging
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
 
-from sqlalchemy import desc, func, or_, and_
+from sqlalchemy import case, desc, func, or_, and_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from app.models.analytics import (
+    AnalyticsDailyRollup,
     BusinessMetric,
     DetectionAccuracyLog,
     UserRetentionCohort,
-    ConversionFunnel
+    ConversionFunnel,
+    UsageHourlyRollup,
 )
 from app.models.processing import PhotoDB, ProcessingStatus
 from app.models.usage import ActionType, ProcessingJob, UsageLog
@@ -20,6 +24,48 @@ from app.models.user import User
 
 logger = logging.getLogger(__name__)
 
+# Totals stored per day in analytics_daily_rollup, in column order
+DAILY_ROLLUP_FIELDS = (
+    "new_users",
+    "jobs",
+    "completed_jobs",
+    "photos",
+    "total_detections",
+    "correct_detections",
+)
+# Recent days are recomputed every run because their jobs may still complete;
+# older days change only when cleanup_expired_jobs deletes their jobs
+DAILY_ROLLUP_REFRESH_DAYS = 2
+# How far back missing rollup rows are filled in
+DAILY_ROLLUP_BACKFILL_DAYS = 90
+# Hourly usage buckets this recent are recomputed on every refresh
+HOURLY_ROLLUP_REFRESH_HOURS = 2
+# An empty usage_hourly_rollup is filled this far back (the popular-hours maximum)
+HOURLY_ROLLUP_BACKFILL_DAYS = 365
+# Usage log rows streamed per fetch while bucketing
+HOURLY_ROLLUP_YIELD_PER = 1000
+
+
+def _upsert(db: Session, model, rows: List[Dict[str, Any]], conflict_columns: List[str]) -> None:
+    """
+    INSERT rows, overwriting the other columns of any row that already exists
+    for conflict_columns. Rollup refreshes run on every app instance, so
+    concurrent refreshes of the same bucket must converge instead of failing
+    on the unique constraint.
+    """
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=conflict_columns,
+        set_={
+            column: stmt.excluded[column]
+            for column in rows[0]
+            if column not in conflict_columns
+        },
+    )
+    db.execute(stmt, rows)
+
+
 class AnalyticsService:
     """
     Business Intelligence service optimized for ML performance and accuracy tracking.
@@ -114,6 +160,198 @@ class AnalyticsService:
             
         db.commit()
 
+    def get_window_totals(self, db: Session, start: datetime, end: datetime) -> Dict[str, int]:
+        """Aggregate the DAILY_ROLLUP_FIELDS totals over [start, end) from the raw tables."""
+        new_users = db.query(func.count(User.id)).filter(
+            User.created_at >= start, User.created_at < end
+        ).scalar() or 0
+
+        jobs, completed_jobs, photos = db.query(
+            func.count(ProcessingJob.id),
+            func.sum(case((ProcessingJob.status == "completed", 1), else_=0)),
+            func.sum(ProcessingJob.total_photos),
+        ).filter(ProcessingJob.created_at >= start, ProcessingJob.created_at < end).one()
+
+        total_detections, correct_detections = db.query(
+            func.count(DetectionAccuracyLog.id),
+            func.sum(case((DetectionAccuracyLog.is_correct == True, 1), else_=0)),
+        ).filter(
+            DetectionAccuracyLog.detected_at >= start, DetectionAccuracyLog.detected_at < end
+        ).one()
+
+        return {
+            "new_users": new_users,
+            "jobs": jobs,
+            "completed_jobs": int(completed_jobs or 0),
+            "photos": int(photos or 0),
+            "total_detections": total_detections,
+            "correct_detections": int(correct_detections or 0),
+        }
+
+    def get_period_totals(self, db: Session, since_date: datetime, end_date: datetime) -> Dict[str, int]:
+        """
+        Sum the DAILY_ROLLUP_FIELDS totals for [since_date, end_date).
+
+        Whole days are read from analytics_daily_rollup and only the partial
+        first and current days hit the raw tables. If any whole day has not
+        been rolled up yet, the full window is aggregated live instead.
+
+        Both paths count only jobs still on record: cleanup_expired_jobs
+        re-rolls the days whose jobs it deletes, so a rolled-up day never
+        keeps totals for removed jobs and photos.
+        """
+        first_full_day = since_date.date() + timedelta(days=1)
+        today = end_date.date()
+        expected_days = (today - first_full_day).days
+
+        if expected_days <= 0:
+            return self.get_window_totals(db, since_date, end_date)
+
+        rollup = db.query(
+            func.count(AnalyticsDailyRollup.id),
+            *(func.sum(getattr(AnalyticsDailyRollup, field)) for field in DAILY_ROLLUP_FIELDS),
+        ).filter(
+            AnalyticsDailyRollup.date >= first_full_day,
+            AnalyticsDailyRollup.date < today,
+        ).one()
+
+        if rollup[0] < expected_days:
+            return self.get_window_totals(db, since_date, end_date)
+
+        totals = {
+            field: int(value or 0)
+            for field, value in zip(DAILY_ROLLUP_FIELDS, rollup[1:])
+        }
+
+        partial_windows = (
+            (since_date, datetime.combine(first_full_day, time.min, tzinfo=timezone.utc)),
+            (datetime.combine(today, time.min, tzinfo=timezone.utc), end_date),
+        )
+        for start, end in partial_windows:
+            for field, value in self.get_window_totals(db, start, end).items():
+                totals[field] += value
+
+        return totals
+
+    def rollup_daily_analytics(self, db: Session, day: date) -> Dict[str, int]:
+        """
+        Precompute one UTC day's totals. Re-running a day overwrites its row.
+        Returns the totals written.
+        """
+        return self.rollup_days(db, [day])[day]
+
+    def rollup_days(self, db: Session, days: Iterable[date]) -> Dict[date, Dict[str, int]]:
+        """
+        Precompute the totals for each UTC day and write them in one upsert,
+        committing together with any pending changes on the session.
+        Returns the totals written per day.
+        """
+        computed_at = datetime.now(timezone.utc)
+        totals_by_day = {}
+        for day in days:
+            day_start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+            totals_by_day[day] = self.get_window_totals(db, day_start, day_start + timedelta(days=1))
+
+        if totals_by_day:
+            _upsert(
+                db,
+                AnalyticsDailyRollup,
+                [
+                    {"date": day, **totals, "computed_at": computed_at}
+                    for day, totals in totals_by_day.items()
+                ],
+                ["date"],
+            )
+        db.commit()
+        return totals_by_day
+
+    def refresh_daily_rollups(self, db: Session, today: Optional[date] = None) -> int:
+        """
+        Nightly job: recompute the most recent days and fill any gaps in the
+        backfill window. Returns the number of days rolled up.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        window_start = today - timedelta(days=DAILY_ROLLUP_BACKFILL_DAYS)
+
+        existing_days = {
+            row.date for row in db.query(AnalyticsDailyRollup.date).filter(
+                AnalyticsDailyRollup.date >= window_start,
+                AnalyticsDailyRollup.date < today,
+            )
+        }
+
+        days_to_roll = [
+            today - timedelta(days=offset)
+            for offset in range(1, DAILY_ROLLUP_BACKFILL_DAYS + 1)
+            if offset <= DAILY_ROLLUP_REFRESH_DAYS
+            or today - timedelta(days=offset) not in existing_days
+        ]
+
+        return len(self.rollup_days(db, days_to_roll))
+
+    def refresh_hourly_usage_rollups(self, db: Session, now: Optional[datetime] = None) -> int:
+        """
+        Recompute usage_hourly_rollup from the last rolled-up hour (or the
+        backfill window when empty) through the current hour.
+        Returns the number of buckets written.
+        """
+        now = now or datetime.now(timezone.utc)
+        current_hour = now.replace(minute=0, second=0, microsecond=0)
+
+        latest_hour = db.query(func.max(UsageHourlyRollup.hour_start)).scalar()
+        if latest_hour is None:
+            window_start = current_hour - timedelta(days=HOURLY_ROLLUP_BACKFILL_DAYS)
+        else:
+            if latest_hour.tzinfo is None:
+                latest_hour = latest_hour.replace(tzinfo=timezone.utc)
+            window_start = min(latest_hour, current_hour - timedelta(hours=HOURLY_ROLLUP_REFRESH_HOURS))
+
+        # (user_id, hour_start, action_type, success) -> [actions, photos]
+        buckets: Dict[tuple, List[int]] = defaultdict(lambda: [0, 0])
+        logs = (
+            db.query(
+                UsageLog.user_id,
+                UsageLog.action_type,
+                UsageLog.success,
+                UsageLog.created_at,
+                UsageLog.photo_count,
+            )
+            .filter(UsageLog.created_at >= window_start)
+            .execution_options(yield_per=HOURLY_ROLLUP_YIELD_PER)
+        )
+        for user_id, action_type, success, created_at, photo_count in logs:
+            # SQLite reads back naive values, which are stored as UTC
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            else:
+                created_at = created_at.astimezone(timezone.utc)
+            bucket = buckets[(
+                user_id,
+                created_at.replace(minute=0, second=0, microsecond=0),
+                action_type.value,
+                success,
+            )]
+            bucket[0] += 1
+            bucket[1] += photo_count or 0
+
+        # Usage logs are append-only, so a bucket never disappears; upserting the
+        # recomputed counts is enough and stays safe across instances
+        if buckets:
+            _upsert(db, UsageHourlyRollup, [
+                {
+                    "user_id": user_id,
+                    "hour_start": hour_start,
+                    "action_type": action_type,
+                    "success": success,
+                    "actions": actions,
+                    "photos": photos,
+                }
+                for (user_id, hour_start, action_type, success), (actions, photos) in buckets.items()
+            ], ["user_id", "hour_start", "action_type", "success"])
+        db.commit()
+
+        return len(buckets)
+
     async def get_ai_first_pass_accuracy(self, db: Session, user_id: int, days: int = 30) -> float:
         """
         Calculate AI accuracy using "Guilty Until Proven Innocent" logic for unknowns.
@@ -174,67 +412,78 @@ class AnalyticsService:
         """
         since_date = datetime.utcnow() - timedelta(days=days)
 
-        # SECURITY: User-scoped queries only
-        usage_logs = (
-            db.query(UsageLog)
+        # SECURITY: User-scoped queries only. Aggregated in SQL, one row per action type.
+        action_rows = (
+            db.query(
+                UsageLog.action_type,
+                func.count(UsageLog.id),
+                func.sum(UsageLog.photo_count),
+                func.sum(case((UsageLog.success == True, 1), else_=0)),
+                func.sum(UsageLog.file_size_mb),
+            )
             .filter(UsageLog.user_id == user_id, UsageLog.created_at >= since_date)
+            .group_by(UsageLog.action_type)
             .all()
         )
 
-        processing_jobs = (
-            db.query(ProcessingJob)
+        total_jobs, total_processing_time, total_job_photos, completed_jobs, failed_jobs = (
+            db.query(
+                func.count(ProcessingJob.id),
+                func.sum(ProcessingJob.total_processing_time_seconds),
+                func.sum(ProcessingJob.total_photos),
+                func.sum(case((ProcessingJob.status == ProcessingStatus.COMPLETED.value, 1), else_=0)),
+                func.sum(case((ProcessingJob.status == ProcessingStatus.FAILED.value, 1), else_=0)),
+            )
             .filter(
                 ProcessingJob.user_id == user_id, ProcessingJob.created_at >= since_date
             )
-            .all()
+            .one()
         )
 
+        action_counts: Dict[ActionType, int] = {}
+        action_photos: Dict[ActionType, int] = {}
+        total_actions = successful_actions = 0
+        total_file_size_mb = 0.0
+        for action_type, count, photos, successes, file_size_mb in action_rows:
+            action_counts[action_type] = count
+            action_photos[action_type] = int(photos or 0)
+            total_actions += count
+            successful_actions += int(successes or 0)
+            total_file_size_mb += file_size_mb or 0
+
+        total_processing_time = total_processing_time or 0
+
         # Calculate statistics with ZeroDivisionError protection
         stats = {
             "user_id": user_id,
             "period_days": days,
             "since_date": since_date.isoformat(),
             # Action counts
-            "total_actions": len(usage_logs),
-            "uploads": len([log for log in usage_logs if log.action_type == ActionType.UPLOAD]),
-            "processes": len([log for log in usage_logs if log.action_type == ActionType.PROCESS]),
-            "exports": len([log for log in usage_logs if log.action_type == ActionType.EXPORT]),
-            "logins": len([log for log in usage_logs if log.action_type == ActionType.LOGIN]),
+            "total_actions": total_actions,
+            "uploads": action_counts.get(ActionType.UPLOAD, 0),
+            "processes": action_counts.get(ActionType.PROCESS, 0),
+            "exports": action_counts.get(ActionType.EXPORT, 0),
+            "logins": action_counts.get(ActionType.LOGIN, 0),
             # Photo statistics
-            "total_photos_uploaded": sum(
-                log.photo_count for log in usage_logs if log.action_type == ActionType.UPLOAD
-            ),
-            "total_photos_processed": sum(
-                log.photo_count for log in usage_logs if log.action_type == ActionType.PROCESS
-            ),
+            "total_photos_uploaded": action_photos.get(ActionType.UPLOAD, 0),
+            "total_photos_processed": action_photos.get(ActionType.PROCESS, 0),
             # Processing statistics with null safety
-            "total_processing_time_seconds": sum(
-                job.total_processing_time_seconds or 0 for job in processing_jobs
-            ),
+            "total_processing_time_seconds": total_processing_time,
             "average_processing_time_per_job": (
-                sum(job.total_processing_time_seconds or 0 for job in processing_jobs)
-                / len(processing_jobs) if processing_jobs else 0.0
+                total_processing_time / total_jobs if total_jobs else 0.0
             ),
             "average_photos_per_job": (
-                sum(job.total_photos for job in processing_jobs) 
-                / len(processing_jobs) if processing_jobs else 0.0
+                (total_job_photos or 0) / total_jobs if total_jobs else 0.0
             ),
             # Success rates with null safety
             "success_rate": (
-                len([log for log in usage_logs if log.success]) / len(usage_logs) * 100
-                if usage_logs else 100.0
+                successful_actions / total_actions * 100 if total_actions else 100.0
             ),
-            "total_file_size_mb": sum(log.file_size_mb or 0 for log in usage_logs),
+            "total_file_size_mb": total_file_size_mb,
             # Job statistics
-            "total_jobs": len(processing_jobs),
-            "completed_jobs": len([
-                job for job in processing_jobs 
-                if job.status == ProcessingStatus.COMPLETED
-            ]),
-            "failed_jobs": len([
-                job for job in processing_jobs 
-                if job.status == ProcessingStatus.FAILED
-            ])
+            "total_jobs": total_jobs,
+            "completed_jobs": int(completed_jobs or 0),
+            "failed_jobs": int(failed_jobs or 0),
         }
 
         return stats
@@ -297,27 +546,32 @@ class AnalyticsService:
         """
         Get user-specific usage patterns by hour.
         SECURITY: Only analyzes activity for the specified user_id.
+
+        Reads usage_hourly_rollup, so the window is whole hours and the
+        latest activity appears once the rollup refreshes.
         """
-        since_date = datetime.utcnow() - timedelta(days=days)
+        since_hour = (datetime.now(timezone.utc) - timedelta(days=days)).replace(
+            minute=0, second=0, microsecond=0
+        )
 
         # SECURITY: User-scoped query only
         result = (
             db.query(
-                func.extract("hour", UsageLog.created_at).label("hour"),
-                func.count(UsageLog.id).label("count"),
+                func.extract("hour", UsageHourlyRollup.hour_start).label("hour"),
+                func.sum(UsageHourlyRollup.actions).label("count"),
             )
             .filter(
-                UsageLog.user_id == user_id,  # SECURITY: User isolation
-                UsageLog.created_at >= since_date
+                UsageHourlyRollup.user_id == user_id,  # SECURITY: User isolation
+                UsageHourlyRollup.hour_start >= since_hour
             )
-            .group_by(func.extract("hour", UsageLog.created_at))
+            .group_by(func.extract("hour", UsageHourlyRollup.hour_start))
             .all()
         )
 
         # Initialize all hours to 0
         hour_stats = {hour: 0 for hour in range(24)}
         for hour, count in result:
-            hour_stats[int(hour)] = count
+            hour_stats[int(hour)] = int(count)
 
         return hour_stats
 
@@ -1,27 +1,235 @@
 import asyncio
+import base64
+import html
 import logging
 import os
-import smtplib
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from typing import Optional, Tuple
+from datetime import datetime, timezone
+from email.header import Header
+from typing import List, Optional, Tuple
+
+import aiosmtplib
 
 logger = logging.getLogger(__name__)
 
+# Badge colour and label per feedback type
+FEEDBACK_TYPE_INFO = {
+    "bug": {"color": "#ef4444", "label": "Bug Report"},
+    "suggestion": {"color": "#f59e0b", "label": "Feature Suggestion"},
+    "improvement": {"color": "#10b981", "label": "Improvement Idea"},
+    "general": {"color": "#3b82f6", "label": "General Feedback"},
+}
+
+# Close the reused SMTP session after this long without sends
+SMTP_IDLE_TIMEOUT_SECONDS = 60
+
+# Static email markup is formatted once per send with str.format; only the
+# dynamic fields are substituted, the CSS/skeleton is built at import time.
+_FEEDBACK_EMAIL_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>
+        body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px; }}
+        .header {{ background: linear-gradient(135deg, #3b82f6, #1d4ed8); color: white; padding: 20px; border-radius: 8px 8px 0 0; text-align: center; }}
+        .content {{ background: #f8fafc; padding: 20px; border: 1px solid #e2e8f0; }}
+        .footer {{ background: #1f2937; color: #9ca3af; padding: 15px; border-radius: 0 0 8px 8px; font-size: 12px; text-align: center; }}
+        .type-badge {{ display: inline-block; background: {badge_color}; color: white; padding: 4px 12px; border-radius: 20px; font-size: 12px; font-weight: 600; margin-bottom: 15px; }}
+        .field {{ margin-bottom: 15px; }}
+        .label {{ font-weight: 600; color: #374151; display: block; margin-bottom: 5px; }}
+        .value {{ background: white; padding: 10px; border-radius: 4px; border: 1px solid #d1d5db; }}
+        .system-info {{ font-family: 'Courier New', monospace; font-size: 11px; color: #6b7280; }}
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>TagSort Feedback</h1>
+        <p>New feedback submission received</p>
+    </div>
+
+    <div class="content">
+        <div class="type-badge">{badge_label}</div>
+
+        <div class="field">
+            <span class="label">Submitted:</span>
+            <div class="value">{formatted_time}</div>
+        </div>
+
+        <div class="field">
+            <span class="label">Title:</span>
+            <div class="value">{title}</div>
+        </div>
+
+        <div class="field">
+            <span class="label">Description:</span>
+            <div class="value">{description_html}</div>
+        </div>
+{optional_fields}    </div>
+
+    <div class="footer">
+        <p>This email was automatically generated by the TagSort feedback system.</p>
+        <p>Feedback ID: {feedback_id}</p>
+    </div>
+</body>
+</html>
+"""
+
+_FEEDBACK_USER_EMAIL_FIELD = """
+        <div class="field">
+            <span class="label">User Email:</span>
+            <div class="value"><a href="mailto:{email}">{email}</a></div>
+        </div>
+"""
+
+_FEEDBACK_SYSTEM_INFO_FIELD = """
+        <div class="field">
+            <span class="label">System Information:</span>
+            <div class="value system-info">{system_info}</div>
+        </div>
+"""
+
+_PASSWORD_RESET_EMAIL_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>
+        body {{ 
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; 
+            line-height: 1.6; 
+            color: #333; 
+            max-width: 600px; 
+            margin: 0 auto; 
+            padding: 20px; 
+        }}
+        .container {{ 
+            background: #ffffff; 
+            border: 1px solid #e0e0e0; 
+            border-radius: 8px; 
+            padding: 30px; 
+        }}
+        .header {{ 
+            text-align: center; 
+            margin-bottom: 30px; 
+        }}
+        .logo {{ 
+            font-size: 32px; 
+            font-weight: bold; 
+            color: #3b82f6; 
+        }}
+        h1 {{ 
+            color: #1f2937; 
+            font-size: 24px; 
+            margin-top: 20px; 
+        }}
+        .button {{ 
+            display: inline-block; 
+            background: #3b82f6; 
+            color: white !important; 
+            padding: 12px 30px; 
+            border-radius: 6px; 
+            text-decoration: none; 
+            font-weight: 600; 
+            margin: 20px 0; 
+        }}
+        .button:hover {{ 
+            background: #2563eb; 
+        }}
+        .warning {{ 
+            background: #fef3c7; 
+            border: 1px solid #f59e0b; 
+            border-radius: 6px; 
+            padding: 15px; 
+            margin: 20px 0; 
+        }}
+        .footer {{ 
+            margin-top: 30px; 
+            padding-top: 20px; 
+            border-top: 1px solid #e0e0e0; 
+            font-size: 12px; 
+            color: #6b7280; 
+            text-align: center; 
+        }}
+        .security-info {{ 
+            background: #f3f4f6; 
+            padding: 10px; 
+            border-radius: 4px; 
+            font-size: 12px; 
+            margin-top: 20px; 
+        }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <div class="logo">📸 TagSort</div>
+            <h1>Password Reset Request</h1>
+        </div>
+
+        <p>Hi {user_name},</p>
+
+        <p>We received a request to reset your password for your TagSort account. 
+        If you made this request, click the button below to reset your password:</p>
+
+        <div style="text-align: center;">
+            <a href="{reset_url}" class="button">Reset Password</a>
+        </div>
+
+        <p style="font-size: 14px; color: #6b7280;">
+            Or copy and paste this link into your browser:<br>
+            <code style="background: #f3f4f6; padding: 5px; word-break: break-all;">
+                {reset_url}
+            </code>
+        </p>
+
+        <div class="warning">
+            <strong>⚠️ Important Security Information:</strong>
+            <ul style="margin: 10px 0;">
+                <li>This link will expire in <strong>1 hour</strong></li>
+                <li>The link can only be used <strong>once</strong></li>
+                <li>If you didn't request this reset, please ignore this email</li>
+                <li>Your password won't change unless you click the link and create a new one</li>
+            </ul>
+        </div>
+
+        <div class="security-info">
+            <strong>Security Details:</strong><br>
+            Request made from IP: {ip_address}<br>
+            Time: {requested_at}
+        </div>
+
+        <div class="footer">
+            <p>This is an automated message from TagSort. Please do not reply to this email.</p>
+            <p>If you're having trouble clicking the button, copy and paste the URL above into your browser.</p>
+            <p style="margin-top: 20px;">
+                © 2024 TagSort. All rights reserved.<br>
+                <a href="#" style="color: #6b7280;">Privacy Policy</a> | 
+                <a href="#" style="color: #6b7280;">Terms of Service</a>
+            </p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
 
 class EmailService:
     def __init__(self):
         self.admin_email = os.getenv("ADMIN_EMAIL")
+        # ADMIN_EMAIL may list several comma-separated addresses
+        self.admin_emails = [
+            email.strip() for email in (self.admin_email or "").split(",") if email.strip()
+        ]
         self.smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
         self.smtp_port = int(os.getenv("SMTP_PORT", "587"))
         self.smtp_username = os.getenv("SMTP_USERNAME")
         self.smtp_password = os.getenv("SMTP_PASSWORD")
         self.smtp_use_tls = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
 
-        # Thread pool for async email sending
-        self.executor = ThreadPoolExecutor(max_workers=2)
+        # One authenticated SMTP session reused across sends (TLS + AUTH paid once)
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self._smtp_lock = asyncio.Lock()
+        self._idle_close_handle: Optional[asyncio.TimerHandle] = None
 
     def is_configured(self) -> bool:
         """Check if email is properly configured"""
@@ -33,162 +241,151 @@ class EmailService:
         ]
         return all(setting for setting in required_settings)
 
-    def _send_email_sync(
-        self, subject: str, body: str, to_email: str, from_email: Optional[str] = None
-    ) -> bool:
-        """Send email synchronously (runs in thread pool)"""
-        try:
-            # Create message
-            msg = MIMEMultipart("alternative")
-            msg["Subject"] = subject
-            msg["From"] = from_email or self.smtp_username
-            msg["To"] = to_email
-
-            # Add HTML body
-            html_part = MIMEText(body, "html")
-            msg.attach(html_part)
-
-            # Connect and send
-            server = smtplib.SMTP(self.smtp_host, self.smtp_port)
-
-            if self.smtp_use_tls:
-                server.starttls()
-
-            server.login(self.smtp_username, self.smtp_password)
-            server.send_message(msg)
-            server.quit()
-
-            logger.info(f"Email sent successfully to {to_email}")
-            return True
+    def _build_message(self, subject: str, body: str, to_email: str, from_email: str) -> bytes:
+        """
+        Build a single-part HTML email as raw RFC 5322 bytes. Our emails never
+        carry attachments, so the MIMEMultipart object tree isn't needed.
+        """
+        # Collapse newlines so user-supplied titles can't inject extra headers
+        subject = " ".join(subject.splitlines())
+        if not subject.isascii():
+            subject = Header(subject, "utf-8").encode(linesep="\r\n")
+
+        headers = (
+            f"From: {from_email}\r\n"
+            f"To: {to_email}\r\n"
+            f"Subject: {subject}\r\n"
+            "MIME-Version: 1.0\r\n"
+            'Content-Type: text/html; charset="utf-8"\r\n'
+            "Content-Transfer-Encoding: base64\r\n"
+            "\r\n"
+        )
+        # base64 keeps the body 7-bit safe for servers without 8BITMIME
+        encoded_body = base64.encodebytes(body.encode("utf-8")).replace(b"\n", b"\r\n")
+        return headers.encode("utf-8") + encoded_body
+
+    async def _get_connection(self) -> aiosmtplib.SMTP:
+        """Return the shared SMTP session, connecting and logging in if needed"""
+        if self._smtp is None or not self._smtp.is_connected:
+            client = aiosmtplib.SMTP(
+                hostname=self.smtp_host,
+                port=self.smtp_port,
+                start_tls=self.smtp_use_tls,
+            )
+            await client.connect()
+            await client.login(self.smtp_username, self.smtp_password)
+            self._smtp = client
+        return self._smtp
+
+    def _schedule_idle_close(self):
+        """(Re)start the idle timer that closes the shared SMTP session"""
+        if self._idle_close_handle:
+            self._idle_close_handle.cancel()
+        self._idle_close_handle = asyncio.get_running_loop().call_later(
+            SMTP_IDLE_TIMEOUT_SECONDS,
+            lambda: asyncio.ensure_future(self._close_connection()),
+        )
 
-        except Exception as e:
-            logger.error(f"Failed to send email to {to_email}: {str(e)}")
-            return False
+    async def _close_connection(self):
+        """Politely end the shared SMTP session"""
+        async with self._smtp_lock:
+            if self._smtp is not None and self._smtp.is_connected:
+                try:
+                    await self._smtp.quit()
+                except aiosmtplib.SMTPException:
+                    self._smtp.close()
+            self._smtp = None
 
     async def send_email_async(
         self, subject: str, body: str, to_email: str, from_email: Optional[str] = None
     ) -> bool:
-        """Send email asynchronously"""
+        """Send email asynchronously over the shared SMTP session"""
+        return await self.send_email_bulk(subject, body, [to_email], from_email)
+
+    async def send_email_bulk(
+        self,
+        subject: str,
+        body: str,
+        to_emails: List[str],
+        from_email: Optional[str] = None,
+    ) -> bool:
+        """
+        Send one message to several recipients in a single SMTP transaction
+        (one MAIL FROM + N RCPT TO); the server does the fan-out.
+        """
         if not self.is_configured():
             logger.info("Email not configured - skipping email notification")
             return False
 
+        recipients = ", ".join(to_emails)
         try:
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                self.executor,
-                self._send_email_sync,
-                subject,
-                body,
-                to_email,
-                from_email,
-            )
-            return result
+            sender = from_email or self.smtp_username
+            message = self._build_message(subject, body, recipients, sender)
+
+            async with self._smtp_lock:
+                try:
+                    client = await self._get_connection()
+                    await client.sendmail(sender, to_emails, message)
+                except aiosmtplib.SMTPServerDisconnected:
+                    # Server dropped the reused session; reconnect once and retry
+                    self._smtp = None
+                    client = await self._get_connection()
+                    await client.sendmail(sender, to_emails, message)
+                self._schedule_idle_close()
+
+            logger.info(f"Email sent successfully to {recipients}")
+            return True
+
         except Exception as e:
-            logger.error(f"Async email error: {str(e)}")
+            logger.error(f"Failed to send email to {recipients}: {str(e)}")
             return False
 
     def format_feedback_email(self, feedback_data: dict) -> Tuple[str, str]:
         """Format feedback data into email subject and HTML body"""
 
-        # Format timestamp
-        try:
-            timestamp = datetime.fromisoformat(feedback_data.get("timestamp", ""))
-            formatted_time = timestamp.strftime("%Y-%m-%d at %H:%M:%S")
-        except:
-            formatted_time = feedback_data.get("timestamp", "Unknown")
+        # Format timestamp (only attempt parsing when there is a string to parse)
+        raw_timestamp = feedback_data.get("timestamp")
+        formatted_time = raw_timestamp or "Unknown"
+        if isinstance(raw_timestamp, str) and raw_timestamp:
+            try:
+                formatted_time = datetime.fromisoformat(raw_timestamp).strftime(
+                    "%Y-%m-%d at %H:%M:%S"
+                )
+            except ValueError:
+                pass  # Keep the raw value
 
         # Get type color and label
-        type_info = {
-            "bug": {"color": "#ef4444", "label": "Bug Report"},
-            "suggestion": {"color": "#f59e0b", "label": "Feature Suggestion"},
-            "improvement": {"color": "#10b981", "label": "Improvement Idea"},
-            "general": {"color": "#3b82f6", "label": "General Feedback"},
-        }
-
-        feedback_type = feedback_data.get("type", "general")
-        info = type_info.get(feedback_type, type_info["general"])
+        info = FEEDBACK_TYPE_INFO.get(
+            feedback_data.get("type", "general"), FEEDBACK_TYPE_INFO["general"]
+        )
 
         # Create subject
         subject = (
             f"New Feedback: {info['label']} - {feedback_data.get('title', 'No Title')}"
         )
 
-        # FIX: Process description outside f-string to avoid SyntaxError in Python 3.11
+        # Preserve line breaks from the submitted description
         description_text = feedback_data.get('description', 'No description provided')
         description_html = description_text.replace('\n', '<br>')
 
-        # Create HTML body
-        body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <style>
-                body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: linear-gradient(135deg, #3b82f6, #1d4ed8); color: white; padding: 20px; border-radius: 8px 8px 0 0; text-align: center; }}
-                .content {{ background: #f8fafc; padding: 20px; border: 1px solid #e2e8f0; }}
-                .footer {{ background: #1f2937; color: #9ca3af; padding: 15px; border-radius: 0 0 8px 8px; font-size: 12px; text-align: center; }}
-                .type-badge {{ display: inline-block; background: {info['color']}; color: white; padding: 4px 12px; border-radius: 20px; font-size: 12px; font-weight: 600; margin-bottom: 15px; }}
-                .field {{ margin-bottom: 15px; }}
-                .label {{ font-weight: 600; color: #374151; display: block; margin-bottom: 5px; }}
-                .value {{ background: white; padding: 10px; border-radius: 4px; border: 1px solid #d1d5db; }}
-                .system-info {{ font-family: 'Courier New', monospace; font-size: 11px; color: #6b7280; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>TagSort Feedback</h1>
-                <p>New feedback submission received</p>
-            </div>
-            
-            <div class="content">
-                <div class="type-badge">{info['label']}</div>
-                
-                <div class="field">
-                    <span class="label">Submitted:</span>
-                    <div class="value">{formatted_time}</div>
-                </div>
-                
-                <div class="field">
-                    <span class="label">Title:</span>
-                    <div class="value">{feedback_data.get('title', 'No title provided')}</div>
-                </div>
-                
-                <div class="field">
-                    <span class="label">Description:</span>
-                    <div class="value">{description_html}</div>
-                </div>
-        """
-
-        # Add email if provided
+        # Optional fields are only rendered when provided
+        optional_fields = ""
         if feedback_data.get("email"):
-            body += f"""
-                <div class="field">
-                    <span class="label">User Email:</span>
-                    <div class="value"><a href="mailto:{feedback_data['email']}">{feedback_data['email']}</a></div>
-                </div>
-            """
-
-        # Add system info if provided
+            optional_fields += _FEEDBACK_USER_EMAIL_FIELD.format(email=feedback_data["email"])
         if feedback_data.get("system_info"):
-            body += f"""
-                <div class="field">
-                    <span class="label">System Information:</span>
-                    <div class="value system-info">{feedback_data['system_info']}</div>
-                </div>
-            """
-
-        body += f"""
-            </div>
-            
-            <div class="footer">
-                <p>This email was automatically generated by the TagSort feedback system.</p>
-                <p>Feedback ID: {feedback_data.get('id', 'Unknown')}</p>
-            </div>
-        </body>
-        </html>
-        """
+            optional_fields += _FEEDBACK_SYSTEM_INFO_FIELD.format(
+                system_info=feedback_data["system_info"]
+            )
+
+        body = _FEEDBACK_EMAIL_TEMPLATE.format(
+            badge_color=info["color"],
+            badge_label=info["label"],
+            formatted_time=formatted_time,
+            title=feedback_data.get("title", "No title provided"),
+            description_html=description_html,
+            optional_fields=optional_fields,
+            feedback_id=feedback_data.get("id", "Unknown"),
+        )
 
         return subject, body
 
@@ -201,11 +398,11 @@ class EmailService:
         try:
             subject, body = self.format_feedback_email(feedback_data)
 
-            # Send to admin email
-            success = await self.send_email_async(
+            # Send to all admin addresses in one SMTP transaction
+            success = await self.send_email_bulk(
                 subject=subject,
                 body=body,
-                to_email=self.admin_email,
+                to_emails=self.admin_emails,
                 from_email=self.smtp_username,
             )
 
@@ -229,129 +426,13 @@ class EmailService:
             
             subject = "Password Reset Request - TagSort"
             
-            body = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <style>
-                    body {{ 
-                        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; 
-                        line-height: 1.6; 
-                        color: #333; 
-                        max-width: 600px; 
-                        margin: 0 auto; 
-                        padding: 20px; 
-                    }}
-                    .container {{ 
-                        background: #ffffff; 
-                        border: 1px solid #e0e0e0; 
-                        border-radius: 8px; 
-                        padding: 30px; 
-                    }}
-                    .header {{ 
-                        text-align: center; 
-                        margin-bottom: 30px; 
-                    }}
-                    .logo {{ 
-                        font-size: 32px; 
-                        font-weight: bold; 
-                        color: #3b82f6; 
-                    }}
-                    h1 {{ 
-                        color: #1f2937; 
-                        font-size: 24px; 
-                        margin-top: 20px; 
-                    }}
-                    .button {{ 
-                        display: inline-block; 
-                        background: #3b82f6; 
-                        color: white !important; 
-                        padding: 12px 30px; 
-                        border-radius: 6px; 
-                        text-decoration: none; 
-                        font-weight: 600; 
-                        margin: 20px 0; 
-                    }}
-                    .button:hover {{ 
-                        background: #2563eb; 
-                    }}
-                    .warning {{ 
-                        background: #fef3c7; 
-                        border: 1px solid #f59e0b; 
-                        border-radius: 6px; 
-                        padding: 15px; 
-                        margin: 20px 0; 
-                    }}
-                    .footer {{ 
-                        margin-top: 30px; 
-                        padding-top: 20px; 
-                        border-top: 1px solid #e0e0e0; 
-                        font-size: 12px; 
-                        color: #6b7280; 
-                        text-align: center; 
-                    }}
-                    .security-info {{ 
-                        background: #f3f4f6; 
-                        padding: 10px; 
-                        border-radius: 4px; 
-                        font-size: 12px; 
-                        margin-top: 20px; 
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <div class="logo">📸 TagSort</div>
-                        <h1>Password Reset Request</h1>
-                    </div>
-                    
-                    <p>Hi {user_name},</p>
-                    
-                    <p>We received a request to reset your password for your TagSort account. 
-                    If you made this request, click the button below to reset your password:</p>
-                    
-                    <div style="text-align: center;">
-                        <a href="{reset_url}" class="button">Reset Password</a>
-                    </div>
-                    
-                    <p style="font-size: 14px; color: #6b7280;">
-                        Or copy and paste this link into your browser:<br>
-                        <code style="background: #f3f4f6; padding: 5px; word-break: break-all;">
-                            {reset_url}
-                        </code>
-                    </p>
-                    
-                    <div class="warning">
-                        <strong>⚠️ Important Security Information:</strong>
-                        <ul style="margin: 10px 0;">
-                            <li>This link will expire in <strong>1 hour</strong></li>
-                            <li>The link can only be used <strong>once</strong></li>
-                            <li>If you didn't request this reset, please ignore this email</li>
-                            <li>Your password won't change unless you click the link and create a new one</li>
-                        </ul>
-                    </div>
-                    
-                    <div class="security-info">
-                        <strong>Security Details:</strong><br>
-                        Request made from IP: {ip_address or 'Unknown'}<br>
-                        Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}
-                    </div>
-                    
-                    <div class="footer">
-                        <p>This is an automated message from TagSort. Please do not reply to this email.</p>
-                        <p>If you're having trouble clicking the button, copy and paste the URL above into your browser.</p>
-                        <p style="margin-top: 20px;">
-                            © 2024 TagSort. All rights reserved.<br>
-                            <a href="#" style="color: #6b7280;">Privacy Policy</a> | 
-                            <a href="#" style="color: #6b7280;">Terms of Service</a>
-                        </p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
+            # User-controlled values are HTML-escaped; the label says UTC, so use UTC
+            body = _PASSWORD_RESET_EMAIL_TEMPLATE.format(
+                user_name=html.escape(user_name or ""),
+                reset_url=html.escape(reset_url),
+                ip_address=html.escape(ip_address or "Unknown"),
+                requested_at=datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC"),
+            )
 
             # Send email
             success = await self.send_email_async(
@@ -2,13 +2,19 @@
 Enhanced data export and reporting service.
 """
 
+import asyncio
 import csv
+import functools
 import io
+import itertools
 import json
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from sqlalchemy import desc, func
+import orjson
+import xlsxwriter
+from cachetools import TTLCache
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 
 from app.models.analytics import (
@@ -20,6 +26,73 @@ from app.models.analytics import (
 from app.models.usage import ProcessingJob as ProcessingJobDB
 from app.models.usage import UsageLog
 from app.models.user import User
+from app.services.analytics_service import analytics_service
+from database import SessionLocal
+
+# Flush the CSV buffer to the client once it grows past this many characters
+CSV_STREAM_CHUNK_SIZE = 64 * 1024
+# Rows fetched per round-trip when streaming large result sets
+EXPORT_YIELD_PER = 1000
+
+# Identical report requests within this window are served from memory
+EXPORT_CACHE_TTL_SECONDS = 60
+EXPORT_CACHE_SIZE = 32
+
+SYSTEM_METRIC_FIELDS = [
+    "timestamp",
+    "metric_type",
+    "metric_name",
+    "value",
+    "unit",
+    "endpoint",
+    "user_id",
+    "job_id",
+    "metadata",
+]
+
+
+def _cached_export(method):
+    """
+    Serve repeat calls with the same arguments (other than db) from the TTL cache.
+    Concurrent identical calls share one in-flight build; unrelated keys never
+    wait on each other. Streamed CSV output belongs to the response consuming
+    it, so it is neither cached nor shared.
+    """
+
+    @functools.wraps(method)
+    async def wrapper(self, db: Session, *args, **kwargs) -> Union[bytes, Iterator[bytes]]:
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        cached = self._export_cache.get(key)
+        if cached is not None:
+            return cached
+
+        in_flight = self._export_in_flight.get(key)
+        if in_flight is not None:
+            # Shielded so a cancelled follower can't cancel the shared build
+            shared = await asyncio.shield(in_flight)
+            if shared is not None:
+                return shared
+            # The build streamed or failed: nothing to share, run our own
+            return await method(self, db, *args, **kwargs)
+
+        in_flight = asyncio.get_running_loop().create_future()
+        self._export_in_flight[key] = in_flight
+        result = None
+        try:
+            result = await method(self, db, *args, **kwargs)
+            if isinstance(result, bytes):
+                self._export_cache[key] = result
+            return result
+        finally:
+            del self._export_in_flight[key]
+            in_flight.set_result(result if isinstance(result, bytes) else None)
+
+    return wrapper
+
+
+def _write_cell_as_text(worksheet, row, col, value, cell_format=None):
+    """xlsxwriter write handler for values without a native cell type."""
+    return worksheet.write_string(row, col, str(value), cell_format)
 
 
 class ExportService:
@@ -29,91 +102,108 @@ class ExportService:
 
     def __init__(self):
         self.supported_formats = ["json", "csv", "excel"]
+        self._export_cache = TTLCache(
+            maxsize=EXPORT_CACHE_SIZE, ttl=EXPORT_CACHE_TTL_SECONDS
+        )
+        # Builds in progress per cache key, so concurrent identical requests compute once
+        self._export_in_flight: Dict[tuple, asyncio.Future] = {}
 
+    @_cached_export
     async def export_user_analytics(
         self,
         db: Session,
         format: str = "csv",
         days: int = 30,
         include_engagement: bool = True,
-    ) -> bytes:
+    ) -> Union[bytes, Iterator[bytes]]:
         """Export comprehensive user analytics data."""
 
-        since_date = datetime.utcnow() - timedelta(days=days)
+        now = datetime.now(timezone.utc)
+        since_date = now - timedelta(days=days)
 
         # Collect user data
-        users_query = db.query(
-            User.id,
-            User.email,
-            User.full_name,
-            User.created_at,
-            User.last_login,
-            User.is_active,
-            User.total_photos_uploaded,
-            User.total_photos_processed,
-            User.total_exports,
-        ).order_by(User.created_at.desc())
-
-        users_data = []
-        for user in users_query.all():
-            # Get recent activity metrics
-            recent_activity = (
-                db.query(func.count(UsageLog.id))
-                .filter(UsageLog.user_id == user.id, UsageLog.created_at >= since_date)
-                .scalar()
-                or 0
+        users_stmt = (
+            select(
+                User.id,
+                User.email,
+                User.full_name,
+                User.created_at,
+                User.last_login,
+                User.is_active,
+                User.total_photos_uploaded,
+                User.total_photos_processed,
+                User.total_exports,
             )
+            .order_by(User.created_at.desc())
+            .execution_options(yield_per=EXPORT_YIELD_PER)
+        )
 
-            # Get job success rate
-            total_jobs = (
-                db.query(ProcessingJobDB)
-                .filter(ProcessingJobDB.user_id == user.id)
-                .count()
+        # Aggregate per-user counts once up front instead of querying per user
+        recent_activity_by_user = dict(
+            db.query(UsageLog.user_id, func.count(UsageLog.id))
+            .filter(UsageLog.created_at >= since_date)
+            .group_by(UsageLog.user_id)
+            .all()
+        )
+
+        job_counts_by_user = {
+            user_id: (total, completed or 0)
+            for user_id, total, completed in db.query(
+                ProcessingJobDB.user_id,
+                func.count(ProcessingJobDB.id),
+                func.sum(case((ProcessingJobDB.status == "completed", 1), else_=0)),
             )
+            .group_by(ProcessingJobDB.user_id)
+            .all()
+        }
 
-            completed_jobs = (
-                db.query(ProcessingJobDB)
-                .filter(
-                    ProcessingJobDB.user_id == user.id,
-                    ProcessingJobDB.status == "completed",
-                )
-                .count()
+        engagement_by_user = {}
+        if include_engagement:
+            engagement_by_user = dict(
+                db.query(UserEngagement.user_id, func.count(UserEngagement.id))
+                .filter(UserEngagement.timestamp >= since_date)
+                .group_by(UserEngagement.user_id)
+                .all()
             )
 
-            success_rate = (completed_jobs / total_jobs * 100) if total_jobs > 0 else 0
-
-            user_data = {
-                "user_id": user.id,
-                "email": user.email,
-                "full_name": user.full_name,
-                "created_at": user.created_at.isoformat(),
-                "last_login": user.last_login.isoformat() if user.last_login else None,
-                "is_active": user.is_active,
-                "total_photos_uploaded": user.total_photos_uploaded,
-                "total_photos_processed": user.total_photos_processed,
-                "total_exports": user.total_exports,
-                "recent_activity_count": recent_activity,
-                "total_processing_jobs": total_jobs,
-                "job_success_rate": round(success_rate, 2),
-                "account_age_days": (datetime.utcnow() - user.created_at).days,
-            }
-
-            if include_engagement:
-                # Add engagement metrics
-                engagement_count = (
-                    db.query(UserEngagement)
-                    .filter(
-                        UserEngagement.user_id == user.id,
-                        UserEngagement.timestamp >= since_date,
-                    )
-                    .count()
+        def user_rows():
+            for user in db.execute(users_stmt):
+                recent_activity = recent_activity_by_user.get(user.id, 0)
+                total_jobs, completed_jobs = job_counts_by_user.get(user.id, (0, 0))
+
+                success_rate = (
+                    (completed_jobs / total_jobs * 100) if total_jobs > 0 else 0
                 )
 
-                user_data["engagement_events"] = engagement_count
+                # SQLite reads back naive values, which are stored as UTC
+                created_at = user.created_at
+                if created_at.tzinfo is None:
+                    created_at = created_at.replace(tzinfo=timezone.utc)
+
+                user_data = {
+                    "user_id": user.id,
+                    "email": user.email,
+                    "full_name": user.full_name,
+                    "created_at": user.created_at.isoformat(),
+                    "last_login": (
+                        user.last_login.isoformat() if user.last_login else None
+                    ),
+                    "is_active": user.is_active,
+                    "total_photos_uploaded": user.total_photos_uploaded,
+                    "total_photos_processed": user.total_photos_processed,
+                    "total_exports": user.total_exports,
+                    "recent_activity_count": recent_activity,
+                    "total_processing_jobs": total_jobs,
+                    "job_success_rate": round(success_rate, 2),
+                    "account_age_days": (now - created_at).days,
+                }
+
+                if include_engagement:
+                    user_data["engagement_events"] = engagement_by_user.get(user.id, 0)
 
-            users_data.append(user_data)
+                yield user_data
 
-        return await self._format_data(users_data, format, "user_analytics")
+        return await self._format_data(user_rows(), format, "user_analytics")
 
     async def export_system_metrics(
         self,
@@ -121,12 +211,22 @@ class ExportService:
         format: str = "csv",
         days: int = 7,
         metric_types: Optional[List[str]] = None,
-    ) -> bytes:
+    ) -> Union[bytes, Iterator[bytes]]:
         """Export system performance metrics."""
 
-        since_date = datetime.utcnow() - timedelta(days=days)
+        since_date = datetime.now(timezone.utc) - timedelta(days=days)
 
-        query = db.query(SystemMetric).filter(SystemMetric.timestamp >= since_date)
+        stmt = select(
+            SystemMetric.timestamp,
+            SystemMetric.metric_type,
+            SystemMetric.metric_name,
+            SystemMetric.value,
+            SystemMetric.unit,
+            SystemMetric.endpoint,
+            SystemMetric.user_id,
+            SystemMetric.job_id,
+            SystemMetric.metric_metadata,
+        ).where(SystemMetric.timestamp >= since_date)
 
         if metric_types:
             from app.models.analytics import SystemMetricType
@@ -137,135 +237,77 @@ class ExportService:
                 if hasattr(SystemMetricType, mt.upper())
             ]
             if type_filters:
-                query = query.filter(SystemMetric.metric_type.in_(type_filters))
+                stmt = stmt.where(SystemMetric.metric_type.in_(type_filters))
 
-        metrics = query.order_by(SystemMetric.timestamp.desc()).all()
+        metrics = db.execute(
+            stmt.order_by(SystemMetric.timestamp.desc()).execution_options(
+                yield_per=EXPORT_YIELD_PER
+            )
+        )
 
-        metrics_data = []
-        for metric in metrics:
-            metrics_data.append(
-                {
-                    "timestamp": metric.timestamp.isoformat(),
-                    "metric_type": metric.metric_type.value,
-                    "metric_name": metric.metric_name,
-                    "value": metric.value,
-                    "unit": metric.unit,
-                    "endpoint": metric.endpoint,
-                    "user_id": metric.user_id,
-                    "job_id": metric.job_id,
-                    "metadata": (
-                        json.dumps(metric.metric_metadata)
-                        if metric.metric_metadata
-                        else None
-                    ),
-                }
+        metrics_data = (
+            (
+                metric.timestamp,
+                metric.metric_type.value,
+                *metric[2:8],
+                json.dumps(metric.metric_metadata) if metric.metric_metadata else None,
             )
+            for metric in metrics
+        )
 
-        return await self._format_data(metrics_data, format, "system_metrics")
+        return await self._format_data(
+            metrics_data, format, "system_metrics", fieldnames=SYSTEM_METRIC_FIELDS
+        )
 
+    @_cached_export
     async def export_business_report(
         self, db: Session, format: str = "json", days: int = 30
-    ) -> bytes:
+    ) -> Union[bytes, Iterator[bytes]]:
         """Export comprehensive business intelligence report."""
 
-        since_date = datetime.utcnow() - timedelta(days=days)
-        end_date = datetime.utcnow()
-
-        # Executive summary
-        total_users = db.query(User).count()
-        active_users = (
-            db.query(func.count(func.distinct(UsageLog.user_id)))
-            .filter(UsageLog.created_at >= since_date)
-            .scalar()
-            or 0
+        end_date = datetime.now(timezone.utc)
+        since_date = end_date - timedelta(days=days)
+
+        # Independent report sections run concurrently, each on its own
+        # connection; the request's session serves the first one
+        (
+            (totals, total_users),
+            (active_users, top_users),
+            total_engagements,
+            daily_trends,
+        ) = await asyncio.gather(
+            asyncio.to_thread(self._report_totals, db, since_date, end_date),
+            asyncio.to_thread(
+                self._run_with_session, self._report_user_activity, since_date
+            ),
+            asyncio.to_thread(
+                self._run_with_session, self._report_engagements, since_date
+            ),
+            asyncio.to_thread(
+                self._run_with_session, self._report_daily_trends, since_date
+            ),
         )
 
-        new_users = db.query(User).filter(User.created_at >= since_date).count()
+        new_users = totals["new_users"]
 
         # Processing metrics
-        total_jobs = (
-            db.query(ProcessingJobDB)
-            .filter(ProcessingJobDB.created_at >= since_date)
-            .count()
-        )
-
-        completed_jobs = (
-            db.query(ProcessingJobDB)
-            .filter(
-                ProcessingJobDB.created_at >= since_date,
-                ProcessingJobDB.status == "completed",
-            )
-            .count()
-        )
-
-        total_photos = (
-            db.query(func.sum(ProcessingJobDB.total_photos))
-            .filter(ProcessingJobDB.created_at >= since_date)
-            .scalar()
-            or 0
-        )
+        total_jobs = totals["jobs"]
+        completed_jobs = totals["completed_jobs"]
+        total_photos = totals["photos"]
 
         # Detection accuracy
-        accuracy_stats = (
-            db.query(
-                func.count(DetectionAccuracyLog.id).label("total"),
-                func.count(DetectionAccuracyLog.id)
-                .filter(DetectionAccuracyLog.is_correct == True)
-                .label("correct"),
-            )
-            .filter(DetectionAccuracyLog.detected_at >= since_date)
-            .first()
-        )
-
         detection_accuracy = (
-            (accuracy_stats.correct / accuracy_stats.total * 100)
-            if accuracy_stats.total > 0
+            (totals["correct_detections"] / totals["total_detections"] * 100)
+            if totals["total_detections"] > 0
             else 0
         )
 
-        # User engagement summary
-        total_engagements = (
-            db.query(UserEngagement)
-            .filter(UserEngagement.timestamp >= since_date)
-            .count()
-        )
-
-        # Top users by activity
-        top_users = (
-            db.query(
-                User.id,
-                User.email,
-                User.full_name,
-                func.count(UsageLog.id).label("activity_count"),
-            )
-            .join(UsageLog)
-            .filter(UsageLog.created_at >= since_date)
-            .group_by(User.id)
-            .order_by(desc("activity_count"))
-            .limit(10)
-            .all()
-        )
-
-        # Performance trends (daily)
-        daily_trends = (
-            db.query(
-                func.date(ProcessingJobDB.created_at).label("date"),
-                func.count(ProcessingJobDB.id).label("jobs"),
-                func.sum(ProcessingJobDB.total_photos).label("photos"),
-                func.avg(ProcessingJobDB.progress).label("avg_progress"),
-            )
-            .filter(ProcessingJobDB.created_at >= since_date)
-            .group_by(func.date(ProcessingJobDB.created_at))
-            .order_by("date")
-            .all()
-        )
-
         # Compile comprehensive report
         report = {
             "report_metadata": {
-                "generated_at": datetime.utcnow().isoformat(),
-                "period_start": since_date.isoformat(),
-                "period_end": end_date.isoformat(),
+                "generated_at": end_date,
+                "period_start": since_date,
+                "period_end": end_date,
                 "period_days": days,
                 "report_version": "1.0",
             },
@@ -311,7 +353,7 @@ class ExportService:
             "performance_trends": {
                 "daily_processing": [
                     {
-                        "date": trend.date.isoformat(),
+                        "date": trend.date,
                         "jobs_created": trend.jobs,
                         "photos_processed": int(trend.photos or 0),
                         "average_progress": round(trend.avg_progress or 0, 2),
@@ -323,53 +365,114 @@ class ExportService:
 
         return await self._format_data(report, format, "business_report")
 
+    @staticmethod
+    def _run_with_session(query_fn, *args):
+        """Run query_fn with a dedicated session so it can execute in parallel."""
+        session = SessionLocal()
+        try:
+            return query_fn(session, *args)
+        finally:
+            session.close()
+
+    def _report_totals(
+        self, db: Session, since_date: datetime, end_date: datetime
+    ) -> Tuple[Dict[str, int], int]:
+        """Executive summary totals (whole days come from the nightly rollup)."""
+        totals = analytics_service.get_period_totals(db, since_date, end_date)
+        total_users = db.query(func.count(User.id)).scalar() or 0
+        return totals, total_users
+
+    @staticmethod
+    def _report_user_activity(db: Session, since_date: datetime) -> Tuple[int, List]:
+        """Active user count and top 10 users from one per-user UsageLog aggregate."""
+        user_activity = (
+            db.query(
+                UsageLog.user_id, func.count(UsageLog.id).label("activity_count")
+            )
+            .filter(UsageLog.created_at >= since_date)
+            .group_by(UsageLog.user_id)
+            .cte("user_activity")
+        )
+
+        active_users = (
+            db.query(func.count()).select_from(user_activity).scalar() or 0
+        )
+
+        top_users = (
+            db.query(
+                User.id,
+                User.email,
+                User.full_name,
+                user_activity.c.activity_count,
+            )
+            .join(user_activity, user_activity.c.user_id == User.id)
+            .order_by(user_activity.c.activity_count.desc())
+            .limit(10)
+            .all()
+        )
+
+        return active_users, top_users
+
+    @staticmethod
+    def _report_engagements(db: Session, since_date: datetime) -> int:
+        """Total engagement events in the period."""
+        return (
+            db.query(UserEngagement)
+            .filter(UserEngagement.timestamp >= since_date)
+            .count()
+        )
+
+    @staticmethod
+    def _report_daily_trends(db: Session, since_date: datetime) -> List:
+        """Per-day job and photo volume for the period."""
+        date_col = func.date(ProcessingJobDB.created_at).label("date")
+        return (
+            db.query(
+                date_col,
+                func.count(ProcessingJobDB.id).label("jobs"),
+                func.sum(ProcessingJobDB.total_photos).label("photos"),
+                func.avg(ProcessingJobDB.progress).label("avg_progress"),
+            )
+            .filter(ProcessingJobDB.created_at >= since_date)
+            .group_by(date_col)
+            .order_by(date_col)
+            .all()
+        )
+
     async def export_conversion_funnel(
         self, db: Session, format: str = "csv", days: int = 30
-    ) -> bytes:
+    ) -> Union[bytes, Iterator[bytes]]:
         """Export conversion funnel analysis."""
 
-        since_date = datetime.utcnow() - timedelta(days=days)
+        since_date = datetime.now(timezone.utc) - timedelta(days=days)
 
         # Get conversion data by step
         from app.models.analytics import ConversionStep
 
+        step_counts = dict(
+            db.query(ConversionFunnel.step, func.count(ConversionFunnel.id))
+            .filter(ConversionFunnel.completed_at >= since_date)
+            .group_by(ConversionFunnel.step)
+            .all()
+        )
+
         funnel_data = []
         previous_count = None
 
-        for step in ConversionStep:
-            step_count = (
-                db.query(ConversionFunnel)
-                .filter(
-                    ConversionFunnel.step == step,
-                    ConversionFunnel.completed_at >= since_date,
-                )
-                .count()
-            )
+        for step_order, step in enumerate(ConversionStep, start=1):
+            step_count = step_counts.get(step.value, 0)
 
             # Calculate conversion rate from previous step
             conversion_rate = None
             if previous_count is not None and previous_count > 0:
                 conversion_rate = round((step_count / previous_count * 100), 2)
 
-            # Calculate average time to convert
-            avg_time = (
-                db.query(func.avg(ConversionFunnel.time_to_convert_seconds))
-                .filter(
-                    ConversionFunnel.step == step,
-                    ConversionFunnel.completed_at >= since_date,
-                )
-                .scalar()
-            )
-
             funnel_data.append(
                 {
                     "step": step.value,
-                    "step_order": list(ConversionStep).index(step) + 1,
+                    "step_order": step_order,
                     "user_count": step_count,
                     "conversion_rate_from_previous": conversion_rate,
-                    "average_time_to_convert_hours": (
-                        round(avg_time / 3600, 2) if avg_time else None
-                    ),
                     "drop_off_count": (
                         (previous_count - step_count) if previous_count else 0
                     ),
@@ -382,76 +485,137 @@ class ExportService:
 
     async def export_detection_accuracy_report(
         self, db: Session, format: str = "csv", days: int = 30
-    ) -> bytes:
+    ) -> Union[bytes, Iterator[bytes]]:
         """Export detailed detection accuracy analysis."""
 
-        since_date = datetime.utcnow() - timedelta(days=days)
+        since_date = datetime.now(timezone.utc) - timedelta(days=days)
+
+        accuracy_columns = (
+            DetectionAccuracyLog.detected_at,
+            DetectionAccuracyLog.photo_id,
+            DetectionAccuracyLog.user_id,
+            DetectionAccuracyLog.processing_job_id,
+            DetectionAccuracyLog.final_result,
+            DetectionAccuracyLog.detection_method,
+            DetectionAccuracyLog.manual_label,
+            DetectionAccuracyLog.is_correct,
+            DetectionAccuracyLog.processing_time_ms,
+        )
 
-        accuracy_logs = (
-            db.query(DetectionAccuracyLog)
-            .filter(DetectionAccuracyLog.detected_at >= since_date)
+        accuracy_rows = db.execute(
+            select(*accuracy_columns)
+            .where(DetectionAccuracyLog.detected_at >= since_date)
             .order_by(DetectionAccuracyLog.detected_at.desc())
-            .all()
+            .execution_options(yield_per=EXPORT_YIELD_PER)
         )
 
-        accuracy_data = []
-        for log in accuracy_logs:
-            accuracy_data.append(
-                {
-                    "detected_at": log.detected_at.isoformat(),
-                    "photo_id": log.photo_id,
-                    "user_id": log.user_id,
-                    "processing_job_id": log.processing_job_id,
-                    "google_vision_result": log.google_vision_result,
-                    "google_vision_confidence": log.google_vision_confidence,
-                    "tesseract_result": log.tesseract_result,
-                    "tesseract_confidence": log.tesseract_confidence,
-                    "final_result": log.final_result,
-                    "detection_method": log.detection_method,
-                    "manual_label": log.manual_label,
-                    "is_correct": log.is_correct,
-                    "processing_time_ms": log.processing_time_ms,
-                    "image_dimensions": log.image_dimensions,
-                    "file_size_bytes": log.file_size_bytes,
-                    "image_quality_score": log.image_quality_score,
-                    "bib_visibility_score": log.bib_visibility_score,
-                }
-            )
-
-        return await self._format_data(accuracy_data, format, "detection_accuracy")
-
-    async def _format_data(self, data: Any, format: str, filename_prefix: str) -> bytes:
-        """Format data according to specified format."""
+        return await self._format_data(
+            accuracy_rows,
+            format,
+            "detection_accuracy",
+            fieldnames=[column.key for column in accuracy_columns],
+        )
 
-        datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    async def _format_data(
+        self,
+        data: Any,
+        format: str,
+        filename_prefix: str,
+        fieldnames: Optional[List[str]] = None,
+    ) -> Union[bytes, Iterator[bytes]]:
+        """
+        Format data according to specified format.
+
+        When ``fieldnames`` is given, ``data`` is an iterable of row tuples in
+        that column order; otherwise it is a dict or an iterable of dicts.
+        JSON is returned as bytes; CSV is returned as an iterator of encoded
+        chunks so large exports can be streamed without buffering every row.
+        """
 
         if format.lower() == "json":
-            json_str = json.dumps(data, indent=2, default=str)
-            return json_str.encode("utf-8")
-
-        elif format.lower() == "csv":
-            if isinstance(data, dict):
-                # If it's a single dict, wrap it in a list
-                data = [data]
+            if fieldnames is not None:
+                data = [dict(zip(fieldnames, row)) for row in data]
+            elif not isinstance(data, (dict, list)):
+                data = list(data)
+            # orjson emits datetimes natively; default=str covers Decimal aggregates
+            return orjson.dumps(
+                data,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NAIVE_UTC,
+                default=str,
+            )
 
-            if not data:
-                return b"No data available\n"
+        elif format.lower() in ("csv", "excel"):
+            if fieldnames is None:
+                # A single dict (e.g. a report) becomes a one-row table
+                rows = iter([data] if isinstance(data, dict) else data)
+                first_row = next(rows, None)
+
+                if first_row is None:
+                    data, fieldnames = [], []
+                else:
+                    fieldnames = list(first_row.keys())
+                    data = (
+                        row.values() for row in itertools.chain([first_row], rows)
+                    )
 
-            output = io.StringIO()
-            writer = csv.DictWriter(output, fieldnames=data[0].keys())
-            writer.writeheader()
-            writer.writerows(data)
+            if format.lower() == "excel":
+                return await asyncio.to_thread(self._write_excel, fieldnames, data)
 
-            return output.getvalue().encode("utf-8")
+            if not fieldnames:
+                return iter([b"No data available\n"])
 
-        elif format.lower() == "excel":
-            # For Excel, we'd need openpyxl or xlsxwriter
-            # For now, return CSV format as fallback
-            return await self._format_data(data, "csv", filename_prefix)
+            return self._stream_csv(fieldnames, data)
 
         else:
             raise ValueError(f"Unsupported format: {format}")
 
+    def _stream_csv(
+        self, fieldnames: List[str], rows: Iterable[Iterable[Any]]
+    ) -> Iterator[bytes]:
+        """Yield CSV output in chunks of roughly CSV_STREAM_CHUNK_SIZE."""
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fieldnames)
+
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= CSV_STREAM_CHUNK_SIZE:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    def _write_excel(fieldnames: List[str], rows: Iterable[Iterable[Any]]) -> bytes:
+        """
+        Build an .xlsx workbook. constant_memory flushes each row to a temp
+        file as it is written, so only the final zip is held in memory.
+        """
+
+        output = io.BytesIO()
+        workbook = xlsxwriter.Workbook(
+            output,
+            {
+                "constant_memory": True,
+                "remove_timezone": True,
+                "default_date_format": "yyyy-mm-dd hh:mm:ss",
+            },
+        )
+        worksheet = workbook.add_worksheet()
+        # Nested report sections have no cell type; write them as text
+        for nested_type in (dict, list):
+            worksheet.add_write_handler(nested_type, _write_cell_as_text)
+
+        worksheet.write_row(0, 0, fieldnames)
+        for row_index, row in enumerate(rows, start=1):
+            worksheet.write_row(row_index, 0, list(row))
+
+        workbook.close()
+        return output.getvalue()
+
     def get_supported_formats(self) -> List[str]:
         """Return list of supported export formats."""
         return self.supported_formats.copy()
@@ -474,7 +638,7 @@ class ExportService:
             "frequency": frequency,
             "format": format,
             "email_recipients": email_recipients or [],
-            "created_at": datetime.utcnow().isoformat(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
             "next_run": self._calculate_next_run(frequency),
             "status": "scheduled",
         }
@@ -483,7 +647,7 @@ class ExportService:
 
     def _calculate_next_run(self, frequency: str) -> str:
         """Calculate next run time based on frequency."""
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
 
         if frequency == "daily":
             next_run = now.replace(
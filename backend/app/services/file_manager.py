@@ -3,17 +3,21 @@ Secure Multi-Tenant File Management Service
 Provides user-isolated file operations with strict security controls.
 """
 
+import asyncio
 import logging
 import os
 import shutil
 import uuid
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Path separators and characters unsafe in filenames, mapped to "_" in one pass
+_FILENAME_SANITIZE_TABLE = str.maketrans(dict.fromkeys('/\\<>:"|?*\0', "_"))
+
 
 class SecureFileManager:
     """
@@ -27,6 +31,10 @@ class SecureFileManager:
         self.base_export_dir = Path("exports")
         self.base_temp_dir = Path("temp")
 
+        # Per-user directories are created once and then served from memory
+        self._user_dir_cache: Dict[Tuple[Path, int], Path] = {}
+        self._user_prefix_cache: Dict[int, Tuple[str, ...]] = {}
+
         # Ensure base directories exist
         self._ensure_base_directories()
 
@@ -45,10 +53,33 @@ class SecureFileManager:
         Get user-specific directory with proper isolation.
         Creates directory if it doesn't exist with secure permissions.
         """
-        user_dir = base_dir / str(user_id)
-        user_dir.mkdir(mode=0o700, exist_ok=True)  # User-only access
+        key = (base_dir, user_id)
+        user_dir = self._user_dir_cache.get(key)
+        if user_dir is None:
+            user_dir = base_dir / str(user_id)
+            user_dir.mkdir(mode=0o700, exist_ok=True)  # User-only access
+            self._user_dir_cache[key] = user_dir
         return user_dir
 
+    def _get_user_path_prefixes(self, user_id: int) -> Tuple[str, ...]:
+        """
+        Get the resolved directory prefixes (with trailing separator) for
+        every directory the user may access, computing them only once.
+        """
+        prefixes = self._user_prefix_cache.get(user_id)
+        if prefixes is None:
+            prefixes = tuple(
+                os.path.realpath(self._get_user_directory(base_dir, user_id)) + os.sep
+                for base_dir in (
+                    self.base_upload_dir,
+                    self.base_processed_dir,
+                    self.base_export_dir,
+                    self.base_temp_dir,
+                )
+            )
+            self._user_prefix_cache[user_id] = prefixes
+        return prefixes
+
     def _validate_user_path(self, file_path: Path, user_id: int) -> bool:
         """
         Validate that a file path belongs to the specified user.
@@ -56,24 +87,13 @@ class SecureFileManager:
         """
         try:
             # Resolve any relative paths and symlinks
-            resolved_path = file_path.resolve()
+            resolved_path = os.path.realpath(file_path)
 
             # Check if path is within any of the user's allowed directories
-            user_dirs = [
-                self._get_user_directory(self.base_upload_dir, user_id),
-                self._get_user_directory(self.base_processed_dir, user_id),
-                self._get_user_directory(self.base_export_dir, user_id),
-                self._get_user_directory(self.base_temp_dir, user_id),
-            ]
-
-            for user_dir in user_dirs:
-                try:
-                    resolved_path.relative_to(user_dir.resolve())
-                    return True
-                except ValueError:
-                    continue
-
-            return False
+            prefixes = self._get_user_path_prefixes(user_id)
+            return resolved_path.startswith(prefixes) or (
+                resolved_path + os.sep in prefixes
+            )
         except Exception as e:
             logger.error(f"Path validation error: {e}")
             return False
@@ -106,7 +126,7 @@ class SecureFileManager:
             return job_dir
         return user_dir
 
-    def save_user_file(
+    async def save_user_file(
         self,
         user_id: int,
         file_data: bytes,
@@ -144,16 +164,24 @@ class SecureFileManager:
         unique_filename = f"{uuid.uuid4().hex}_{safe_filename}"
         file_path = target_dir / unique_filename
 
-        # Write file securely
-        with open(file_path, "wb") as f:
-            f.write(file_data)
-
-        # Set secure permissions
-        file_path.chmod(0o600)  # User read/write only
+        # Write off the event loop so concurrent uploads don't stall on disk I/O
+        await asyncio.to_thread(self._write_file, file_path, file_data)
 
         logger.info(f"File saved securely: {file_path} for user {user_id}")
         return file_path
 
+    @staticmethod
+    def _write_file(file_path: Path, file_data: bytes) -> None:
+        """Write file contents, creating the file with owner-only permissions."""
+        # Mode is applied at creation, so the file is never briefly world-readable
+        fd = os.open(
+            file_path,
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC,
+            0o600,  # User read/write only
+        )
+        with os.fdopen(fd, "wb") as f:
+            f.write(file_data)
+
     def get_user_file(self, user_id: int, file_path: str) -> Optional[Path]:
         """
         Securely retrieve a file path for a user.
@@ -234,17 +262,18 @@ class SecureFileManager:
         """
         try:
             if job_id:
-                temp_dir = self.get_user_temp_dir(user_id, job_id)
-                if temp_dir.exists():
-                    shutil.rmtree(temp_dir)
+                # get_user_temp_dir guarantees the directory exists
+                shutil.rmtree(self.get_user_temp_dir(user_id, job_id))
             else:
                 temp_dir = self.get_user_temp_dir(user_id)
-                # Clean all subdirectories but keep the user temp dir
-                for item in temp_dir.iterdir():
-                    if item.is_dir():
-                        shutil.rmtree(item)
-                    else:
-                        item.unlink()
+                # Clean all subdirectories but keep the user temp dir.
+                # DirEntry type checks reuse d_type and never follow symlinks.
+                with os.scandir(temp_dir) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            shutil.rmtree(entry.path)
+                        else:
+                            os.unlink(entry.path)
 
             logger.info(f"Temp files cleaned for user {user_id}, job {job_id}")
             return True
@@ -274,29 +303,46 @@ class SecureFileManager:
         ]
 
         for dir_type, directory in directories:
-            if directory.exists():
-                for file_path in directory.rglob("*"):
-                    if file_path.is_file():
-                        stats[f"{dir_type}_count"] += 1
-                        try:
-                            stats[f"{dir_type}_size_bytes"] += file_path.stat().st_size
-                        except OSError:
-                            pass  # File might be deleted between listing and stat
+            file_count, total_size = self._scan_tree(directory)
+            stats[f"{dir_type}_count"] += file_count
+            stats[f"{dir_type}_size_bytes"] += total_size
 
         return stats
 
+    @staticmethod
+    def _scan_tree(root: Path) -> Tuple[int, int]:
+        """Count regular files under root and sum their sizes without following symlinks."""
+        file_count = 0
+        total_size = 0
+        pending = [root]
+
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except OSError:
+                continue  # Directory missing or removed mid-walk
+
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total_size += entry.stat(follow_symlinks=False).st_size
+                            file_count += 1
+                    except OSError:
+                        pass  # File might be deleted between listing and stat
+
+        return file_count, total_size
+
     @staticmethod
     def _sanitize_filename(filename: str) -> str:
         """
         Sanitize filename to prevent security issues.
         Removes path traversal attempts and dangerous characters.
         """
-        # Remove path separators and dangerous characters
-        unsafe_chars = ["/", "\\", "..", "<", ">", ":", '"', "|", "?", "*", "\0"]
-        safe_name = filename
-
-        for char in unsafe_chars:
-            safe_name = safe_name.replace(char, "_")
+        # Remove path separators, dangerous characters and ".." sequences
+        safe_name = filename.translate(_FILENAME_SANITIZE_TABLE).replace("..", "_")
 
         # Limit length
         if len(safe_name) > 255:
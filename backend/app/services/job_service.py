@@ -6,19 +6,60 @@ Replaces in-memory job storage with database persistence.
 import asyncio
 import logging
 import uuid
-from datetime import datetime, timedelta
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta, timezone
 from typing import Dict, List, Optional
 
-from sqlalchemy import and_
+from cachetools import TTLCache
+from sqlalchemy import and_, insert, update
 from sqlalchemy.orm import Session
 
 from app.models.processing import PhotoDB, ProcessingStatus
 from app.models.usage import ProcessingJob as ProcessingJobDB
-from app.services.detector import NumberDetector
+from app.services.analytics_service import analytics_service
+from app.services.detector import GEMINI_CONCURRENCY_LIMIT, NumberDetector
 from database import get_db
 
 logger = logging.getLogger(__name__)
 
+# Active-job snapshots kept in memory; stalled jobs age out after the TTL
+ACTIVE_JOB_CACHE_SIZE = 1024
+ACTIVE_JOB_CACHE_TTL_SECONDS = 3600
+# Recovered jobs restarted at once after a restart; the rest wait their turn
+RECOVERY_MAX_CONCURRENT_JOBS = 4
+_recovery_sem = asyncio.Semaphore(RECOVERY_MAX_CONCURRENT_JOBS)
+# Photo rows fetched per round-trip when building job results
+RESULTS_YIELD_PER = 500
+# Photos per detector call; the detector bounds its own Gemini concurrency
+DETECTION_CHUNK_SIZE = GEMINI_CONCURRENCY_LIMIT
+
+
+def _utc_date(value: datetime) -> date:
+    """UTC calendar day of a timestamp; naive values (SQLite) are already UTC."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+@dataclass(frozen=True)
+class JobSnapshot:
+    """Session-independent summary of an active job, safe to share across requests."""
+
+    user_id: int
+    status: ProcessingStatus
+    total_photos: int
+    progress: int
+
+    @classmethod
+    def from_job(cls, job: ProcessingJobDB) -> "JobSnapshot":
+        return cls(
+            user_id=job.user_id,
+            status=job.status,
+            total_photos=job.total_photos,
+            progress=job.progress,
+        )
+
 
 class JobService:
     """
@@ -27,8 +68,11 @@ class JobService:
 
     def __init__(self):
         self.detector = NumberDetector()
-        # Keep a small cache for active jobs to reduce database queries
-        self._active_jobs_cache: Dict[str, ProcessingJobDB] = {}
+        # Bounded cache of active job snapshots (never ORM objects, which are
+        # bound to the session that loaded them)
+        self._active_jobs_cache: TTLCache = TTLCache(
+            maxsize=ACTIVE_JOB_CACHE_SIZE, ttl=ACTIVE_JOB_CACHE_TTL_SECONDS
+        )
 
     def create_job(
         self, db: Session, user_id: int, photo_ids: List[str], debug: bool = False
@@ -51,24 +95,29 @@ class JobService:
         db.add(job)
         db.flush()  # Get the ID
 
-        # Create photo records
-        for photo_id in photo_ids:
-            photo = PhotoDB(
-                photo_id=photo_id,
-                user_id=user_id,
-                processing_job_id=job.id,
-                original_filename=f"{photo_id}.jpg",  # Will be updated when we have actual filename
-                file_path=f"uploads/{user_id}/{photo_id}",  # Will be updated with actual path
-                file_size_bytes=0,  # Will be updated
-                file_extension=".jpg",  # Will be updated
-                processing_status=ProcessingStatus.PENDING,
+        # Create photo records in one bulk INSERT rather than one per photo
+        if photo_ids:
+            db.execute(
+                insert(PhotoDB),
+                [
+                    {
+                        "photo_id": photo_id,
+                        "user_id": user_id,
+                        "processing_job_id": job.id,
+                        "original_filename": f"{photo_id}.jpg",  # Will be updated when we have actual filename
+                        "file_path": f"uploads/{user_id}/{photo_id}",  # Will be updated with actual path
+                        "file_size_bytes": 0,  # Will be updated
+                        "file_extension": ".jpg",  # Will be updated
+                        "processing_status": ProcessingStatus.PENDING,
+                    }
+                    for photo_id in photo_ids
+                ],
             )
-            db.add(photo)
 
         db.commit()
 
         # Cache the job
-        self._active_jobs_cache[job_id] = job
+        self._active_jobs_cache[job_id] = JobSnapshot.from_job(job)
 
         logger.info(
             f"Created processing job {job_id} for user {user_id} with {len(photo_ids)} photos"
@@ -82,18 +131,20 @@ class JobService:
         Get a processing job by ID with user isolation.
         SECURITY: For user-facing operations, user_id should always be provided.
         """
-        # Check cache first
-        if job_id in self._active_jobs_cache:
-            cached_job = self._active_jobs_cache[job_id]
-            # SECURITY: Always verify user_id when provided
-            if user_id is not None and cached_job.user_id != user_id:
-                logger.warning(
-                    f"Security: User {user_id} attempted to access job {job_id} owned by user {cached_job.user_id}"
-                )
-                return None
-            return cached_job
+        # Cached snapshot rejects cross-user access without a query
+        cached_job = self._active_jobs_cache.get(job_id)
+        # SECURITY: Always verify user_id when provided
+        if (
+            cached_job is not None
+            and user_id is not None
+            and cached_job.user_id != user_id
+        ):
+            logger.warning(
+                f"Security: User {user_id} attempted to access job {job_id} owned by user {cached_job.user_id}"
+            )
+            return None
 
-        # Query database with mandatory user filter for security
+        # Load the job in this session; query with mandatory user filter for security
         query = db.query(ProcessingJobDB).filter(ProcessingJobDB.job_id == job_id)
         if user_id is not None:
             query = query.filter(ProcessingJobDB.user_id == user_id)
@@ -102,7 +153,7 @@ class JobService:
 
         # Update cache
         if job:
-            self._active_jobs_cache[job_id] = job
+            self._active_jobs_cache[job_id] = JobSnapshot.from_job(job)
 
         return job
 
@@ -110,36 +161,43 @@ class JobService:
         self, db: Session, job_id: str, progress: int, completed_photos: int
     ):
         """
-        Update job progress in database and cache.
+        Update job progress in database and cache, committing whatever else
+        the session has pending in the same transaction.
+        Writes by job_id without loading the job first. Never completes the
+        job; only the final status update in process_job_async does that.
         """
-        job = self.get_job(db, job_id)
-        if job:
-            job.progress = progress
-            job.completed_photos = completed_photos
-            job.updated_at = datetime.utcnow()
-
-            if progress >= 100:
-                job.status = ProcessingStatus.COMPLETED
-                job.completed_at = datetime.utcnow()
-                # Remove from cache when completed
-                self._active_jobs_cache.pop(job_id, None)
+        db.execute(
+            update(ProcessingJobDB)
+            .where(ProcessingJobDB.job_id == job_id)
+            .values(
+                progress=progress,
+                photos_processed=completed_photos,
+                updated_at=datetime.utcnow(),
+            )
+        )
+        db.commit()
 
-            db.commit()
+        cached_job = self._active_jobs_cache.get(job_id)
+        if cached_job is not None:
+            self._active_jobs_cache[job_id] = replace(cached_job, progress=progress)
 
     def mark_job_failed(self, db: Session, job_id: str, error_message: str):
         """
         Mark a job as failed with error message.
         """
-        job = self.get_job(db, job_id)
-        if job:
-            job.status = ProcessingStatus.FAILED
-            job.error_message = error_message
-            job.completed_at = datetime.utcnow()
-
-            # Remove from cache
-            self._active_jobs_cache.pop(job_id, None)
+        db.execute(
+            update(ProcessingJobDB)
+            .where(ProcessingJobDB.job_id == job_id)
+            .values(
+                status=ProcessingStatus.FAILED,
+                error_message=error_message,
+                completed_at=datetime.utcnow(),
+            )
+        )
+        db.commit()
 
-            db.commit()
+        # Remove from cache
+        self._active_jobs_cache.pop(job_id, None)
 
     async def process_job_async(self, job_id: str):
         """
@@ -150,91 +208,140 @@ class JobService:
         db = next(db_gen)
 
         try:
-            job = self.get_job(db, job_id)
+            # Mark the job as processing and read the fields the run needs in
+            # one round-trip. A plain row, unlike an ORM instance, isn't
+            # expired by the commit below, so reading it doesn't re-query.
+            job = db.execute(
+                update(ProcessingJobDB)
+                .where(ProcessingJobDB.job_id == job_id)
+                .values(
+                    status=ProcessingStatus.PROCESSING,
+                    started_at=datetime.utcnow(),
+                )
+                .returning(
+                    ProcessingJobDB.id,
+                    ProcessingJobDB.user_id,
+                    ProcessingJobDB.total_photos,
+                    ProcessingJobDB.debug_mode,
+                )
+            ).one_or_none()
             if not job:
                 logger.error(f"Job {job_id} not found")
                 return
-
-            # Update job status
-            job.status = ProcessingStatus.PROCESSING
-            job.started_at = datetime.utcnow()
             db.commit()
 
             logger.info(
                 f"Starting processing job {job_id} with {job.total_photos} photos"
             )
 
-            # Get photos for this job
-            photos = db.query(PhotoDB).filter(PhotoDB.processing_job_id == job.id).all()
+            # Get photos for this job (only the keys are needed)
+            photos = (
+                db.query(PhotoDB.id, PhotoDB.photo_id)
+                .filter(PhotoDB.processing_job_id == job.id)
+                .all()
+            )
 
-            # Process photos in batches
-            BATCH_SIZE = 5
-            semaphore = asyncio.Semaphore(BATCH_SIZE)
             completed_count = 0
 
-            async def process_photo_with_db(photo: PhotoDB):
-                nonlocal completed_count
-
-                async with semaphore:
-                    try:
-                        # Process the photo
-                        detection_result = await self.detector.process_photo(
-                            photo.photo_id, job.debug_mode
-                        )
-
-                        # Update photo record
-                        if detection_result:
-                            photo.set_detection_result(
-                                detected_number=detection_result.bib_number,
-                                confidence=detection_result.confidence,
-                                method="auto_detection",
-                                bbox=detection_result.bbox,
-                            )
-                            photo.processing_status = ProcessingStatus.COMPLETED
-                        else:
-                            photo.processing_status = ProcessingStatus.FAILED
-                            photo.processing_error = "No detection result"
-
-                        completed_count += 1
-
-                        # Update job progress
-                        progress = int((completed_count / len(photos)) * 100)
-                        self.update_job_progress(db, job_id, progress, completed_count)
-
-                        logger.info(
-                            f"Processed photo {photo.photo_id} ({completed_count}/{len(photos)})"
-                        )
-
-                    except Exception as e:
-                        logger.error(f"Failed to process photo {photo.photo_id}: {e}")
-                        photo.processing_status = ProcessingStatus.FAILED
-                        photo.processing_error = str(e)
-
-                        completed_count += 1
-                        progress = int((completed_count / len(photos)) * 100)
-                        self.update_job_progress(db, job_id, progress, completed_count)
-
-            # Process photos in batches
-            tasks = [process_photo_with_db(photo) for photo in photos]
-            await asyncio.gather(*tasks, return_exceptions=True)
-
-            # Final job update
-            job = self.get_job(db, job_id)
-            if job:
-                job.status = ProcessingStatus.COMPLETED
-                job.completed_at = datetime.utcnow()
-                job.progress = 100
-                db.commit()
+            # Hand photos to the detector a chunk at a time; it prefetches the
+            # chunk's images and runs their detections concurrently
+            for start in range(0, len(photos), DETECTION_CHUNK_SIZE):
+                chunk = photos[start : start + DETECTION_CHUNK_SIZE]
+                try:
+                    detection_results = await self.detector.process_photo_batch(
+                        [photo.photo_id for photo in chunk],
+                        job.debug_mode,
+                        job.user_id,
+                    )
+                    error_message = "No detection result"
+                except Exception as e:
+                    logger.error(
+                        f"Failed to process photos {start + 1}-{start + len(chunk)} of job {job_id}: {e}"
+                    )
+                    detection_results = {}
+                    error_message = str(e)
+
+                # Bulk UPDATE of the chunk's photos by primary key, committed
+                # together with the progress row so progress never runs ahead
+                # of stored results and a later failure keeps them
+                photo_updates = [
+                    self._detection_update(photo.id, detection_results[photo.photo_id])
+                    if detection_results.get(photo.photo_id)
+                    else self._failure_update(photo.id, error_message)
+                    for photo in chunk
+                ]
+                db.execute(update(PhotoDB), photo_updates)
+
+                completed_count += len(chunk)
+                self.update_job_progress(
+                    db, job_id, int((completed_count / len(photos)) * 100), completed_count
+                )
+
+                logger.info(
+                    f"Processed {completed_count}/{len(photos)} photos for job {job_id}"
+                )
+
+            # Final job update, written without re-reading the job
+            db.execute(
+                update(ProcessingJobDB)
+                .where(ProcessingJobDB.job_id == job_id)
+                .values(
+                    status=ProcessingStatus.COMPLETED,
+                    completed_at=datetime.utcnow(),
+                    progress=100,
+                )
+            )
+            db.commit()
+            self._active_jobs_cache.pop(job_id, None)
 
             logger.info(f"Completed processing job {job_id}")
 
         except Exception as e:
             logger.error(f"Job {job_id} failed: {e}")
+            # Drop the failed chunk's uncommitted writes; earlier chunks are kept
+            db.rollback()
             self.mark_job_failed(db, job_id, str(e))
 
         finally:
             db.close()
 
+    async def _process_recovered_job(self, job_id: str):
+        """
+        Reprocess a recovered job, limiting how many run concurrently so a
+        restart with many stalled jobs doesn't swamp the DB and detector.
+        """
+        async with _recovery_sem:
+            await self.process_job_async(job_id)
+
+    @staticmethod
+    def _detection_update(photo_pk: int, detection_result) -> Dict:
+        """Row values for a photo with a detection result (mirrors set_detection_result)."""
+        bbox = detection_result.bbox
+        bbox_x, bbox_y, bbox_width, bbox_height = (
+            bbox if bbox and len(bbox) == 4 else (None, None, None, None)
+        )
+        return {
+            "id": photo_pk,
+            "detected_number": detection_result.bib_number,
+            "confidence": detection_result.confidence,
+            "detection_method": "auto_detection",
+            "bbox_x": bbox_x,
+            "bbox_y": bbox_y,
+            "bbox_width": bbox_width,
+            "bbox_height": bbox_height,
+            "processed_at": datetime.utcnow(),
+            "processing_status": ProcessingStatus.COMPLETED,
+        }
+
+    @staticmethod
+    def _failure_update(photo_pk: int, error_message: str) -> Dict:
+        """Row values for a photo that failed processing."""
+        return {
+            "id": photo_pk,
+            "processing_status": ProcessingStatus.FAILED,
+            "processing_error": error_message,
+        }
+
     def get_user_jobs(
         self, db: Session, user_id: int, limit: int = 10
     ) -> List[ProcessingJobDB]:
@@ -257,15 +364,40 @@ class JobService:
         if not job or job.status != ProcessingStatus.COMPLETED:
             return None
 
-        # Get all photos for this job
-        photos = db.query(PhotoDB).filter(PhotoDB.processing_job_id == job.id).all()
+        # Load only the columns the response needs; no ORM instances or
+        # relationships are materialized. Rows are streamed in batches so the
+        # raw result set is never held in memory alongside the grouped output.
+        photos = (
+            db.query(
+                PhotoDB.photo_id,
+                PhotoDB.original_filename,
+                PhotoDB.file_path,
+                PhotoDB.detected_number,
+                PhotoDB.confidence,
+                PhotoDB.bbox_x,
+                PhotoDB.bbox_y,
+                PhotoDB.bbox_width,
+                PhotoDB.bbox_height,
+                PhotoDB.manual_label,
+                PhotoDB.processing_status,
+            )
+            .filter(PhotoDB.processing_job_id == job.id)
+            .execution_options(yield_per=RESULTS_YIELD_PER)
+        )
 
         # Group by effective bib number
-        grouped = {}
+        grouped = defaultdict(list)
         for photo in photos:
-            bib_number = photo.effective_bib_number or "unknown"
-            if bib_number not in grouped:
-                grouped[bib_number] = []
+            bib_number = photo.manual_label or photo.detected_number or "unknown"
+
+            bbox = None
+            if None not in (photo.bbox_x, photo.bbox_y, photo.bbox_width, photo.bbox_height):
+                bbox = {
+                    "x": photo.bbox_x,
+                    "y": photo.bbox_y,
+                    "width": photo.bbox_width,
+                    "height": photo.bbox_height,
+                }
 
             grouped[bib_number].append(
                 {
@@ -276,7 +408,7 @@ class JobService:
                         {
                             "bib_number": photo.detected_number,
                             "confidence": photo.confidence,
-                            "bbox": photo.bbox,
+                            "bbox": bbox,
                         }
                         if photo.detected_number
                         else None
@@ -286,7 +418,7 @@ class JobService:
                 }
             )
 
-        return grouped
+        return dict(grouped)
 
     def update_manual_label(
         self, db: Session, photo_id: str, bib_number: str, user_id: int
@@ -313,9 +445,11 @@ class JobService:
     def cleanup_expired_jobs(self, db: Session) -> int:
         """
         Clean up expired jobs and their associated data.
+        Rolled-up analytics days that counted the deleted jobs are recomputed
+        in the same commit, so report totals match the live tables.
         """
         expired_jobs = (
-            db.query(ProcessingJobDB)
+            db.query(ProcessingJobDB.id, ProcessingJobDB.job_id, ProcessingJobDB.created_at)
             .filter(
                 and_(
                     ProcessingJobDB.expires_at.isnot(None),
@@ -325,21 +459,28 @@ class JobService:
             .all()
         )
 
-        count = 0
-        for job in expired_jobs:
-            # Delete associated photos
-            db.query(PhotoDB).filter(PhotoDB.processing_job_id == job.id).delete()
+        count = len(expired_jobs)
+        if count > 0:
+            expired_ids = [job.id for job in expired_jobs]
 
-            # Delete job
-            db.delete(job)
+            # Delete associated photos, then the jobs, in two set-based statements
+            db.query(PhotoDB).filter(
+                PhotoDB.processing_job_id.in_(expired_ids)
+            ).delete(synchronize_session=False)
+            db.query(ProcessingJobDB).filter(
+                ProcessingJobDB.id.in_(expired_ids)
+            ).delete(synchronize_session=False)
 
             # Remove from cache
-            self._active_jobs_cache.pop(job.job_id, None)
-
-            count += 1
-
-        if count > 0:
-            db.commit()
+            for job in expired_jobs:
+                self._active_jobs_cache.pop(job.job_id, None)
+
+            # Re-roll closed days only; today is never rolled up
+            today = datetime.now(timezone.utc).date()
+            affected_days = {
+                _utc_date(job.created_at) for job in expired_jobs if job.created_at
+            }
+            analytics_service.rollup_days(db, sorted(day for day in affected_days if day < today))
             logger.info(f"Cleaned up {count} expired jobs")
 
         return count
@@ -360,10 +501,14 @@ class JobService:
                     < datetime.utcnow() - timedelta(minutes=30),
                 )
             )
+            # Each worker process claims a disjoint set of jobs; the row locks
+            # are held until the status changes below are committed
+            .with_for_update(skip_locked=True)
             .all()
         )
 
         recovered_count = 0
+        reset_job_ids = []
         for job in stalled_jobs:
             if job.is_expired():
                 # Mark expired jobs as failed
@@ -375,22 +520,25 @@ class JobService:
                 job.status = ProcessingStatus.PENDING
                 job.started_at = None
                 job.progress = 0
+                reset_job_ids.append(job.id)
 
-                # Reset photo statuses
-                # Reset photo statuses
-                db.query(PhotoDB).filter(
-                    and_(
-                        # Force job.id to string to match the VARCHAR column in PostgreSQL
-                        PhotoDB.processing_job_id == str(job.id), 
-                        PhotoDB.processing_status == ProcessingStatus.PROCESSING,
-                    )
-                ).update({"processing_status": ProcessingStatus.PENDING})
-
-                # Restart the job
-                asyncio.create_task(self.process_job_async(job.job_id))
+                # Restart the job (bounded by _recovery_sem)
+                asyncio.create_task(self._process_recovered_job(job.job_id))
 
             recovered_count += 1
 
+        # Reset photo statuses for every retried job in one statement
+        if reset_job_ids:
+            db.query(PhotoDB).filter(
+                and_(
+                    PhotoDB.processing_job_id.in_(reset_job_ids),
+                    PhotoDB.processing_status == ProcessingStatus.PROCESSING,
+                )
+            ).update(
+                {"processing_status": ProcessingStatus.PENDING},
+                synchronize_session=False,
+            )
+
         if recovered_count > 0:
             db.commit()
             logger.info(f"Recovered {recovered_count} processing jobs on startup")
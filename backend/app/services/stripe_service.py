@@ -1,7 +1,14 @@
+import asyncio
+import json
+import requests
 import stripe
+from requests.adapters import HTTPAdapter
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.models.user import User
-from datetime import datetime, timezone
+from app.models.user import StripeWebhookEvent, User
+from app.services.tier_service import TierService
+from database import SessionLocal
+from datetime import datetime, timedelta, timezone
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,6 +29,52 @@ TIER_TO_PRICE_ID = {
 # Reverse mapping: Price ID to tier name
 PRICE_ID_TO_TIER = {v: k for k, v in TIER_TO_PRICE_ID.items()}
 
+# Upper bound on Stripe API calls in flight at once, so request bursts queue
+# here instead of exhausting the executor and the SDK's connection pool
+STRIPE_MAX_CONCURRENT_CALLS = 50
+_STRIPE_SEM = asyncio.Semaphore(STRIPE_MAX_CONCURRENT_CALLS)
+
+# Connection-level retries (connect failures); Stripe's own retry logic still applies
+STRIPE_HTTP_MAX_RETRIES = 3
+
+# One pooled HTTP session shared by every Stripe call, so requests reuse
+# kept-alive TLS connections instead of handshaking per call
+_stripe_http_session = requests.Session()
+_stripe_http_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=STRIPE_MAX_CONCURRENT_CALLS,
+        pool_maxsize=STRIPE_MAX_CONCURRENT_CALLS,
+        max_retries=STRIPE_HTTP_MAX_RETRIES,
+    ),
+)
+stripe.default_http_client = stripe.RequestsClient(
+    session=_stripe_http_session, verify_ssl_certs=True
+)
+
+# Verified webhook event ids waiting for run_webhook_worker; the events
+# themselves are stored in stripe_webhook_events
+_webhook_queue: asyncio.Queue = asyncio.Queue()
+# Event ids queued or being applied on this instance, so none is queued twice
+_webhook_pending: set = set()
+
+# Events whose handler raised or returned a 5xx are retried up to this many times
+WEBHOOK_MAX_ATTEMPTS = 5
+# How often the worker re-queues stored events that were never applied
+WEBHOOK_RETRY_INTERVAL_SECONDS = 60
+# Younger events are left alone by the sweep; they are most likely still queued
+# on the instance that received them
+WEBHOOK_RETRY_MIN_AGE_SECONDS = 60
+
+
+async def _run_stripe_call(func, *args, **kwargs):
+    """
+    Run a blocking Stripe SDK call in the default executor, bounded by
+    _STRIPE_SEM so it never stalls the event loop.
+    """
+    async with _STRIPE_SEM:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
 
 def get_or_create_stripe_customer(db: Session, user: User) -> str:
     """
@@ -93,6 +146,21 @@ def create_checkout_session(
         return None, str(e.user_message if hasattr(e, 'user_message') else e)
 
 
+async def create_checkout_session_async(
+    db: Session,
+    tier_name: str,
+    user: User,
+    success_url: str,
+    cancel_url: str
+) -> tuple[str | None, str | None]:
+    """
+    Async variant of create_checkout_session for use from request handlers.
+    """
+    return await _run_stripe_call(
+        create_checkout_session, db, tier_name, user, success_url, cancel_url
+    )
+
+
 def create_billing_portal_session(user: User, return_url: str) -> tuple[str | None, str | None]:
     """
     Creates a Stripe Billing Portal session for subscription management.
@@ -113,6 +181,15 @@ def create_billing_portal_session(user: User, return_url: str) -> tuple[str | No
         return None, str(e.user_message if hasattr(e, 'user_message') else e)
 
 
+async def create_billing_portal_session_async(
+    user: User, return_url: str
+) -> tuple[str | None, str | None]:
+    """
+    Async variant of create_billing_portal_session for use from request handlers.
+    """
+    return await _run_stripe_call(create_billing_portal_session, user, return_url)
+
+
 def fulfill_subscription(db: Session, user_id: int, tier_name: str, subscription_id: str = None) -> bool:
     """
     Updates the user's tier in the database after successful subscription.
@@ -133,6 +210,7 @@ def fulfill_subscription(db: Session, user_id: int, tier_name: str, subscription
 
     db.add(user)
     db.commit()
+    TierService.invalidate(user.id)
 
     logger.info(f"Fulfillment SUCCESS: User {user.id} subscribed to {tier_name}.")
     return True
@@ -148,6 +226,14 @@ def cancel_subscription(db: Session, user_id: int) -> bool:
         logger.error(f"Cancellation failed: User ID {user_id} not found.")
         return False
 
+    _downgrade_to_free(db, user)
+    return True
+
+
+def _downgrade_to_free(db: Session, user: User) -> None:
+    """
+    Applies a subscription cancellation to an already-loaded user.
+    """
     user.current_tier = "Free"
     user.subscription_status = "canceled"
     user.stripe_subscription_id = None
@@ -155,14 +241,15 @@ def cancel_subscription(db: Session, user_id: int) -> bool:
 
     db.add(user)
     db.commit()
+    TierService.invalidate(user.id)
 
     logger.info(f"User {user.id} subscription canceled, downgraded to Free.")
-    return True
 
 
 def handle_webhook_event(db: Session, payload: bytes, sig_header: str) -> tuple[str, int]:
     """
-    Verifies signature and processes Stripe webhook events.
+    Verifies signature, stores the event and queues it for run_webhook_worker,
+    so Stripe is answered without waiting on fulfillment writes.
     Returns (message, status_code).
     """
     if not WEBHOOK_SECRET:
@@ -177,9 +264,138 @@ def handle_webhook_event(db: Session, payload: bytes, sig_header: str) -> tuple[
         logger.error("Stripe Webhook Error: Invalid signature")
         return "Invalid signature", 400
 
-    event_type = event['type']
-    data = event['data']['object']
+    event_id = event['id']
+
+    # Persist the event before answering; the unique event_id catches redeliveries
+    db.add(StripeWebhookEvent(
+        event_id=event_id,
+        event_type=event['type'],
+        payload=payload.decode("utf-8"),
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        processed_at = db.query(StripeWebhookEvent.processed_at).filter(
+            StripeWebhookEvent.event_id == event_id
+        ).scalar()
+        if processed_at is not None:
+            logger.info(f"Webhook event {event_id} already processed, skipping")
+            return "Already received", 200
+        # Stored but never applied (failure or restart): treat the redelivery as a retry
+        logger.info(f"Webhook event {event_id} redelivered before it was applied, retrying")
+
+    _enqueue_webhook_event(event_id)
+    return "queued", 200
 
+
+def _enqueue_webhook_event(event_id: str) -> None:
+    """Queue a stored event for run_webhook_worker unless it is already pending here."""
+    if event_id not in _webhook_pending:
+        _webhook_pending.add(event_id)
+        _webhook_queue.put_nowait(event_id)
+
+
+def _apply_webhook_event(event_id: str) -> None:
+    """
+    Applies one stored webhook event in its own session and records the outcome.
+    4xx results mean the event can never apply and are marked processed;
+    exceptions and 5xx results leave it unprocessed for the retry sweep.
+    """
+    db = SessionLocal()
+    try:
+        record = db.query(StripeWebhookEvent).filter(
+            StripeWebhookEvent.event_id == event_id
+        ).first()
+        if record is None or record.processed_at is not None:
+            return
+
+        event_type = record.event_type
+        attempt = record.attempts + 1
+        data = json.loads(record.payload)['data']['object']
+
+        try:
+            message, status_code = _process_webhook_event(db, event_type, data)
+        except Exception as e:
+            db.rollback()
+            logger.exception(f"Unhandled exception processing Stripe webhook {event_id}: {e}")
+            message, status_code = str(e), 500
+
+        values = {"attempts": attempt}
+        if status_code < 500:
+            values["processed_at"] = datetime.now(timezone.utc)
+        db.query(StripeWebhookEvent).filter(
+            StripeWebhookEvent.event_id == event_id,
+            StripeWebhookEvent.processed_at.is_(None),
+        ).update(values, synchronize_session=False)
+        db.commit()
+
+        if status_code != 200:
+            logger.error(f"Stripe webhook {event_id} ({event_type}) failed: {message}")
+        if status_code >= 500 and attempt >= WEBHOOK_MAX_ATTEMPTS:
+            logger.error(f"Stripe webhook {event_id} failed {attempt} times, giving up")
+    finally:
+        db.close()
+
+
+def _find_unapplied_webhook_events() -> list[str]:
+    """Event ids that were stored but never applied and still have retries left."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=WEBHOOK_RETRY_MIN_AGE_SECONDS)
+    db = SessionLocal()
+    try:
+        return [
+            event_id for (event_id,) in db.query(StripeWebhookEvent.event_id)
+            .filter(
+                StripeWebhookEvent.processed_at.is_(None),
+                StripeWebhookEvent.attempts < WEBHOOK_MAX_ATTEMPTS,
+                StripeWebhookEvent.received_at < cutoff,
+            )
+            .order_by(StripeWebhookEvent.received_at)
+        ]
+    finally:
+        db.close()
+
+
+async def run_webhook_worker():
+    """
+    Background consumer for queued webhook events. Events are applied one at
+    a time in arrival order. Every WEBHOOK_RETRY_INTERVAL_SECONDS (and at
+    startup) it also re-queues stored events that were never applied, so a
+    crash, redeploy or failed handler doesn't lose them.
+    """
+    loop = asyncio.get_running_loop()
+    next_sweep_at = loop.time()
+
+    while True:
+        if loop.time() >= next_sweep_at:
+            try:
+                for event_id in await asyncio.to_thread(_find_unapplied_webhook_events):
+                    _enqueue_webhook_event(event_id)
+            except Exception as e:
+                logger.error(f"Stripe webhook retry sweep failed: {e}")
+            next_sweep_at = loop.time() + WEBHOOK_RETRY_INTERVAL_SECONDS
+
+        try:
+            event_id = await asyncio.wait_for(
+                _webhook_queue.get(), timeout=max(0.0, next_sweep_at - loop.time())
+            )
+        except asyncio.TimeoutError:
+            continue
+
+        try:
+            await asyncio.to_thread(_apply_webhook_event, event_id)
+        except Exception as e:
+            logger.exception(f"Unhandled exception applying Stripe webhook {event_id}: {e}")
+        finally:
+            _webhook_pending.discard(event_id)
+            _webhook_queue.task_done()
+
+
+def _process_webhook_event(db: Session, event_type: str, data) -> tuple[str, int]:
+    """
+    Applies a verified Stripe webhook event to the database.
+    Returns (message, status_code).
+    """
     if event_type == 'checkout.session.completed':
         # Initial subscription created
         user_id = data['metadata'].get('user_id')
@@ -237,6 +453,7 @@ def handle_webhook_event(db: Session, payload: bytes, sig_header: str) -> tuple[
                 logger.info(f"User {user.id} changed tier to {new_tier}")
 
         db.commit()
+        TierService.invalidate(user.id)
         return f"Subscription updated for user {user.id}", 200
 
     elif event_type == 'customer.subscription.deleted':
@@ -245,7 +462,8 @@ def handle_webhook_event(db: Session, payload: bytes, sig_header: str) -> tuple[
 
         user = db.query(User).filter(User.stripe_customer_id == customer_id).first()
         if user:
-            cancel_subscription(db, user.id)
+            # User is already loaded; don't look it up again by id
+            _downgrade_to_free(db, user)
             return f"User {user.id} subscription canceled", 200
 
         return "User not found", 200
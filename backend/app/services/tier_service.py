@@ -1,5 +1,11 @@
+import threading
 from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
+from cachetools import TTLCache
+from sqlalchemy import update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from app.models.user import User # Import the updated User model
 import logging
 
@@ -12,7 +18,7 @@ def is_unlimited(limit: int) -> bool:
     """Check if a limit value represents unlimited uploads."""
     return limit == UNLIMITED_UPLOADS
 
-TIER_CONFIGS = {
+_RAW_TIER_CONFIGS = {
     "Free": {
         "max_uploads": 100,
         "duration_days": None,  # No expiry for free tier
@@ -55,22 +61,73 @@ TIER_CONFIGS = {
     }
 }
 
+# Read-only views shared by every caller; features are tuples so nothing can
+# mutate the global config through a returned value
+TIER_CONFIGS: Mapping[str, Mapping[str, Any]] = MappingProxyType({
+    name: MappingProxyType({**config, "features": tuple(config["features"])})
+    for name, config in _RAW_TIER_CONFIGS.items()
+})
+
+# Unknown tier names resolve to the Free config
+_DEFAULT_TIER_CONFIG = TIER_CONFIGS["Free"]
+
+# Flat per-tier lookups, built once at import for the upload admission path
+UPLOAD_LIMITS = {name: config["max_uploads"] for name, config in TIER_CONFIGS.items()}
+UNLIMITED_TIERS = frozenset(
+    name for name, limit in UPLOAD_LIMITS.items() if is_unlimited(limit)
+)
+_FREE_UPLOAD_LIMIT = UPLOAD_LIMITS["Free"]
+# Paid tiers that stay active when no expiry date is set
+_PAID_TIERS_NO_EXPIRY = frozenset({"Amateur", "Pro", "Power User", "Enterprise"})
+
+# The tier-only part of a get_user_tier response, built once per tier
+_RESPONSE_SKELETONS = {
+    name: {
+        "monthly_photo_limit": config["max_uploads"],
+        "features": config["features"],
+        "duration_days": config["duration_days"],
+        "price_cents": config["price_cents"],
+        "is_paid": config["is_paid"],
+    }
+    for name, config in TIER_CONFIGS.items()
+}
+_FREE_RESPONSE_SKELETON = _RESPONSE_SKELETONS["Free"]
+
+# get_user_tier responses per user_id, as (response, active_until). Tier changes
+# invalidate explicitly; the TTL bounds staleness across worker processes.
+USER_TIER_CACHE_SIZE = 10_000
+USER_TIER_CACHE_TTL_SECONDS = 30
+_user_tier_cache: TTLCache = TTLCache(
+    maxsize=USER_TIER_CACHE_SIZE, ttl=USER_TIER_CACHE_TTL_SECONDS
+)
+# Webhook processing invalidates from worker threads; TTLCache isn't thread-safe
+_user_tier_cache_lock = threading.Lock()
+
+
+def _resolve_tier(tier_name: str) -> Mapping[str, Any]:
+    """Returns the config for a tier name, falling back to Free."""
+    return TIER_CONFIGS.get(tier_name, _DEFAULT_TIER_CONFIG)
+
+
 class TierService:
     """Handles all logic related to user tiers, limits, and usage tracking."""
 
     @staticmethod
-    def get_tier_info(tier_name: str) -> dict:
+    def get_tier_info(tier_name: str) -> Mapping[str, Any]:
         """Returns the specific limits and properties for a given tier."""
-        return TIER_CONFIGS.get(tier_name, TIER_CONFIGS["Free"])
+        return _resolve_tier(tier_name)
 
     @staticmethod
     def get_upload_limit(tier_name: str) -> int:
         """Returns the maximum allowed uploads for a tier."""
-        return TierService.get_tier_info(tier_name)["max_uploads"]
+        return UPLOAD_LIMITS.get(tier_name, _FREE_UPLOAD_LIMIT)
 
     @staticmethod
-    def is_tier_active(user: User) -> bool:
-        """Checks if the user's current tier is still active."""
+    def is_tier_active(user: User, now: Optional[datetime] = None) -> bool:
+        """
+        Checks if the user's current tier is still active.
+        Callers making several tier checks can pass one aware UTC `now` for all of them.
+        """
 
         # Free tier is always active (no expiry)
         if user.current_tier == "Free":
@@ -78,44 +135,65 @@ class TierService:
 
         # Paid tiers with no expiry date set
         if user.tier_expiry_date is None:
-            if user.current_tier in ["Amateur", "Pro", "Power User", "Enterprise"]:
-                return True
-            return False
+            return user.current_tier in _PAID_TIERS_NO_EXPIRY
 
-        # Check against an explicit expiry date
-        expiry_date = user.tier_expiry_date.replace(tzinfo=timezone.utc) if user.tier_expiry_date.tzinfo is None else user.tier_expiry_date
-        return datetime.now(timezone.utc) < expiry_date
+        # Check against an explicit expiry date. Writes are normalized to aware
+        # UTC and Postgres returns TIMESTAMPTZ as aware; only SQLite reads back naive.
+        expiry_date = user.tier_expiry_date
+        if expiry_date.tzinfo is None:
+            expiry_date = expiry_date.replace(tzinfo=timezone.utc)
+        return (now or datetime.now(timezone.utc)) < expiry_date
+
+    @staticmethod
+    def _resolve(user: User, now: Optional[datetime] = None) -> Tuple[str, bool, dict]:
+        """
+        Runs the expiry check once and returns
+        (effective_tier, is_active, response skeleton for the effective tier).
+        """
+        is_active = TierService.is_tier_active(user, now)
+        effective_tier = user.current_tier if is_active else "Free"
+        return (
+            effective_tier,
+            is_active,
+            _RESPONSE_SKELETONS.get(effective_tier, _FREE_RESPONSE_SKELETON),
+        )
 
     @staticmethod
-    def get_effective_tier(user: User) -> str:
+    def get_effective_tier(user: User, now: Optional[datetime] = None) -> str:
         """
         Returns the user's effective tier, falling back to Free if paid tier expired.
         """
-        if not TierService.is_tier_active(user):
-            return "Free"
-        return user.current_tier
+        return TierService._resolve(user, now)[0]
 
     @staticmethod
-    def check_upload_allowed(user: User) -> bool:
+    def check_upload_allowed(user: User, now: Optional[datetime] = None) -> bool:
         """
         Determines if the user is allowed to upload based on tier and usage.
         Expired paid tiers fall back to Free tier limits.
         """
-        effective_tier = TierService.get_effective_tier(user)
-        if effective_tier != user.current_tier:
-            logger.info(f"User {user.id} tier {user.current_tier} expired, using Free tier limits")
+        # Fast paths that need no expiry check: Free under quota, and
+        # unlimited tiers with no expiry date
+        tier = user.current_tier
+        if tier == "Free" and user.uploads_this_period < _FREE_UPLOAD_LIMIT:
+            return True
+        if tier in UNLIMITED_TIERS and user.tier_expiry_date is None:
+            return True
 
-        current_limit = TierService.get_upload_limit(effective_tier)
+        effective_tier = TierService.get_effective_tier(user, now)
+        if effective_tier != user.current_tier:
+            logger.info("User %s tier %s expired, using Free tier limits", user.id, user.current_tier)
 
         # Unlimited tier always allows uploads
-        if is_unlimited(current_limit):
+        if effective_tier in UNLIMITED_TIERS:
             return True
 
+        current_limit = TierService.get_upload_limit(effective_tier)
+
         allowed = user.uploads_this_period < current_limit
         if not allowed:
             logger.warning(
-                f"User {user.id} ({effective_tier}) upload limit reached: "
-                f"{user.uploads_this_period} / {current_limit}"
+                "User %s (%s) upload limit reached: %s / %s",
+                user.id, effective_tier, user.uploads_this_period, current_limit
             )
         return allowed
 
@@ -125,56 +203,82 @@ class TierService:
         Gets comprehensive tier information for a specific user.
         Returns tier config combined with user-specific data.
         """
+        with _user_tier_cache_lock:
+            cached = _user_tier_cache.get(user_id)
+        if cached is not None:
+            response, active_until = cached
+            # An active paid tier may have expired since it was cached
+            if active_until is None or datetime.now(timezone.utc) < active_until:
+                return dict(response)
+
         # Get user from database
         user = db.query(User).filter(User.id == user_id).first()
         if not user:
+            return TierService._build_tier_response(None)
+
+        response = TierService._build_tier_response(user)
+        active_until = user.tier_expiry_date if response["is_active"] and user.current_tier != "Free" else None
+        if active_until is not None and active_until.tzinfo is None:
+            active_until = active_until.replace(tzinfo=timezone.utc)
+        with _user_tier_cache_lock:
+            _user_tier_cache[user_id] = (response, active_until)
+        return dict(response)
+
+    @staticmethod
+    def _build_tier_response(user: Optional[User]) -> dict:
+        """
+        Builds the get_user_tier response for a loaded user, or the default
+        Free response when the user doesn't exist.
+        """
+        if user is None:
             # Return default Free tier for non-existent users
-            tier_config = TierService.get_tier_info("Free")
             return {
                 "tier_name": "Free",
-                "monthly_photo_limit": tier_config["max_uploads"],
-                "features": tier_config["features"],
-                "duration_days": tier_config["duration_days"],
-                "price_cents": tier_config["price_cents"],
-                "is_paid": tier_config["is_paid"],
+                **_FREE_RESPONSE_SKELETON,
                 "tier_expiry_date": None,
                 "is_active": False
             }
-        
+
         # Check if tier is active, use effective tier for limits
-        is_active = TierService.is_tier_active(user)
-        effective_tier = TierService.get_effective_tier(user)
-        tier_config = TierService.get_tier_info(effective_tier)
+        effective_tier, is_active, skeleton = TierService._resolve(user)
 
         return {
             "tier_name": effective_tier,  # Show effective tier (Free if expired)
             "original_tier": user.current_tier if not is_active else None,  # Track expired tier
-            "monthly_photo_limit": tier_config["max_uploads"],
-            "features": tier_config["features"],
-            "duration_days": tier_config["duration_days"],
-            "price_cents": tier_config["price_cents"],
-            "is_paid": tier_config["is_paid"],
+            **skeleton,
             "tier_expiry_date": user.tier_expiry_date.isoformat() if user.tier_expiry_date else None,
             "is_active": is_active
         }
 
+    @staticmethod
+    def invalidate(user_id: int) -> None:
+        """Drops the cached get_user_tier response after a tier or usage change."""
+        with _user_tier_cache_lock:
+            _user_tier_cache.pop(user_id, None)
+
     @staticmethod
     def increment_upload_count(db: Session, user: User, count: int = 1) -> None:
         """
         Increments the upload counter for the current billing period.
         Must be called AFTER a successful upload.
         """
-        user.increment_uploads_this_period(count)
-        db.add(user)
+        # Increment in SQL so concurrent uploads can't lose updates, then mirror
+        # the stored value onto the instance without marking it dirty
+        new_count = db.execute(
+            update(User)
+            .where(User.id == user.id)
+            .values(uploads_this_period=User.uploads_this_period + count)
+            .returning(User.uploads_this_period)
+            .execution_options(synchronize_session=False)
+        ).scalar_one()
+        set_committed_value(user, "uploads_this_period", new_count)
+        TierService.invalidate(user.id)
         # Commit will be handled by the caller's transaction (e.g., the upload route)
 
 
-def get_tier_info(tier_name: str) -> dict:
-    """
-    Standalone function for external modules (e.g., stripe_service.py).
-    Returns tier configuration including pricing and features.
-    """
-    return TierService.get_tier_info(tier_name)
+# Standalone lookup for external modules (e.g., stripe_service.py);
+# bound directly to the resolver so it skips the TierService hop
+get_tier_info = _resolve_tier
 
 # Instantiate the service for easy import
 tier_service = TierService()
\ No newline at end of file
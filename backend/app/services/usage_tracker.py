@@ -1,25 +1,36 @@
+import asyncio
 import json
 import logging
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional
 
-from sqlalchemy import desc, func
+from sqlalchemy import case, desc, func, insert, select, update
 from sqlalchemy.orm import Session
 
 from app.models.processing import ProcessingStatus
 from app.models.usage import ActionType, ProcessingJob, UsageLog, UserQuota
 from app.models.user import User
 from app.services.tier_service import TierService
+from database import SessionLocal
 
 logger = logging.getLogger(__name__)
 
+# Buffered usage log rows are written to the database this often
+USAGE_LOG_FLUSH_INTERVAL_SECONDS = 1.0
+# Rows kept for retry while the database is unreachable; the oldest are dropped beyond this
+USAGE_LOG_BUFFER_MAX_ROWS = 10_000
+
 class UsageTracker:
     """
     Service for tracking and analyzing user usage patterns.
     """
 
     def __init__(self):
-        pass
+        # Usage log rows waiting for the background flusher; appended from the
+        # event loop and from worker threads, hence the lock
+        self._log_buffer: List[Dict[str, Any]] = []
+        self._log_buffer_lock = threading.Lock()
 
     def log_action(
         self,
@@ -34,28 +45,83 @@ class UsageTracker:
         details: Optional[dict] = None,
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None,
-    ) -> UsageLog:
+    ) -> None:
         """
         Log a user action to the usage tracking system.
+        The row is buffered and inserted by run_log_flusher, so this neither
+        touches nor commits the caller's session.
         """
-        usage_log = UsageLog(
-            user_id=user_id,
-            action_type=action_type,
-            photo_count=photo_count,
-            processing_time_seconds=processing_time_seconds,
-            file_size_mb=file_size_mb,
-            success=success,
-            error_message=error_message,
-            details=json.dumps(details) if details else None,
-            ip_address=ip_address,
-            user_agent=user_agent,
-        )
-
-        db.add(usage_log)
-        db.commit()
-        db.refresh(usage_log)
+        row = {
+            "user_id": user_id,
+            "action_type": action_type,
+            "created_at": datetime.now(timezone.utc),  # Action time, not flush time
+            "photo_count": photo_count,
+            "processing_time_seconds": processing_time_seconds,
+            "file_size_mb": file_size_mb,
+            "success": success,
+            "error_message": error_message,
+            "details": json.dumps(details) if details else None,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+        }
+
+        with self._log_buffer_lock:
+            self._log_buffer.append(row)
+
+    def flush_logs(self) -> int:
+        """
+        Write all buffered usage log rows in one bulk INSERT.
+        Rows from a failed INSERT go back to the front of the buffer for the
+        next flush. Returns the number of rows written.
+        """
+        with self._log_buffer_lock:
+            rows, self._log_buffer = self._log_buffer, []
+        if not rows:
+            return 0
+
+        try:
+            self._insert_logs(rows)
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} usage log rows, will retry: {e}")
+            with self._log_buffer_lock:
+                self._log_buffer[:0] = rows
+                overflow = len(self._log_buffer) - USAGE_LOG_BUFFER_MAX_ROWS
+                if overflow > 0:
+                    del self._log_buffer[:overflow]
+            if overflow > 0:
+                logger.error(f"Usage log buffer full, dropped {overflow} oldest rows")
+            return 0
+
+        return len(rows)
+
+    @staticmethod
+    def _insert_logs(rows: List[Dict[str, Any]]) -> None:
+        """Bulk INSERT usage log rows in their own session."""
+        db = SessionLocal()
+        try:
+            db.execute(insert(UsageLog), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
 
-        return usage_log
+    async def run_log_flusher(self):
+        """
+        Background task that drains the usage log buffer every
+        USAGE_LOG_FLUSH_INTERVAL_SECONDS, and once more when cancelled.
+        """
+        try:
+            while True:
+                await asyncio.sleep(USAGE_LOG_FLUSH_INTERVAL_SECONDS)
+                try:
+                    await asyncio.to_thread(self.flush_logs)
+                except Exception as e:
+                    logger.error(f"Usage log flush failed: {e}")
+        except asyncio.CancelledError:
+            self.flush_logs()
+            raise
 
     def create_processing_job(
         self,
@@ -87,33 +153,43 @@ class UsageTracker:
 
     def update_processing_job(
         self, db: Session, job_id: str, **updates
-    ) -> Optional[ProcessingJob]:
+    ) -> Optional[Dict[str, Any]]:
         """
         Update a processing job with new information.
+        Returns the updated job as a dict (see ProcessingJob.to_dict), or None
+        if the job doesn't exist.
         """
-        # Find job in database
-        job = db.query(ProcessingJob).filter(ProcessingJob.job_id == job_id).first()
+        columns = ProcessingJob.__mapper__.column_attrs
+        values = {}
+        for key, value in updates.items():
+            if key in columns:
+                values[key] = value
+            else:
+                logger.warning("Job has no attribute '%s', skipping", key)
+
+        if not values:
+            job = db.query(ProcessingJob).filter(ProcessingJob.job_id == job_id).first()
+            return job.to_dict() if job else None
+
+        # One UPDATE ... RETURNING instead of SELECT, modify, commit and refresh
+        job = db.execute(
+            update(ProcessingJob)
+            .where(ProcessingJob.job_id == job_id)
+            .values(**values)
+            .returning(ProcessingJob)
+        ).scalar_one_or_none()
 
         if not job:
             logger.warning(f"Job {job_id} not found in database for update")
             return None
 
-        # Job found, proceed with update
-
-        for key, value in updates.items():
-            if hasattr(job, key):
-                getattr(job, key)
-                setattr(job, key, value)
-                # Attribute updated
-            else:
-                logger.warning(f"Job has no attribute '{key}', skipping")
-
-        # Commit changes
+        # Read the returned row before the commit expires it, so the result
+        # never costs another SELECT
+        result = job.to_dict()
         db.commit()
-        db.refresh(job)
-        logger.info(f"Job {job_id} updated successfully")
+        logger.debug("Job %s updated: %s", job_id, values)
 
-        return job
+        return result
 
     def get_or_create_user_quota(self, db: Session, user_id: int) -> UserQuota:
         """
@@ -122,18 +198,12 @@ class UsageTracker:
         """
         current_month = datetime.utcnow().strftime("%Y-%m")
 
-        # 1. Fetch the User object to get the tier information
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            logger.error(f"User ID {user_id} not found when fetching quota.")
-            # Fallback for safety, but this shouldn't happen if auth works
-            user_tier = "Free"
-        else:
-            # Use effective tier (falls back to Free if paid tier expired)
-            user_tier = TierService.get_effective_tier(user)
-
-        # 2. Determine the limit based on the user's effective tier
-        tier_limit = TierService.get_upload_limit(user_tier)
+        # 1-2. Effective tier and its upload limit (expired tiers and unknown
+        # users resolve to Free). get_user_tier is cached per user and
+        # invalidated on tier changes, so repeated quota checks skip the User SELECT.
+        tier_info = TierService.get_user_tier(db, user_id)
+        user_tier = tier_info["tier_name"]
+        tier_limit = tier_info["monthly_photo_limit"]
         
         # 3. Fetch the quota object
         quota = db.query(UserQuota).filter(UserQuota.user_id == user_id).first()
@@ -231,6 +301,42 @@ class UsageTracker:
 
         return quota
 
+    def get_system_stats(self, db: Session, days: int = 30) -> Dict[str, Any]:
+        """
+        Get system-wide usage statistics for the admin dashboard.
+        Every figure comes from one statement: a single-row CTE per table,
+        cross-joined.
+        """
+        since_date = datetime.now(timezone.utc) - timedelta(days=days)
+
+        users = select(
+            func.count(User.id).label("total_users"),
+            func.sum(case((User.is_active == True, 1), else_=0)).label("active_users"),
+            func.sum(case((User.created_at >= since_date, 1), else_=0)).label("new_users"),
+        ).cte("user_totals")
+
+        logs = select(
+            func.count(UsageLog.id).label("total_actions"),
+            func.count(func.distinct(UsageLog.user_id)).label("users_with_activity"),
+            func.sum(case((UsageLog.action_type == ActionType.UPLOAD, UsageLog.photo_count), else_=0)).label("photos_uploaded"),
+            func.sum(case((UsageLog.success == False, 1), else_=0)).label("failed_actions"),
+        ).where(UsageLog.created_at >= since_date).cte("usage_totals")
+
+        jobs = select(
+            func.count(ProcessingJob.id).label("total_jobs"),
+            func.sum(case((ProcessingJob.status == ProcessingStatus.COMPLETED.value, 1), else_=0)).label("completed_jobs"),
+            func.sum(case((ProcessingJob.status == ProcessingStatus.FAILED.value, 1), else_=0)).label("failed_jobs"),
+            func.sum(ProcessingJob.total_photos).label("photos_processed"),
+        ).where(ProcessingJob.created_at >= since_date).cte("job_totals")
+
+        row = db.execute(select(users, logs, jobs)).one()._mapping
+
+        return {
+            "period_days": days,
+            "since_date": since_date.isoformat(),
+            **{key: int(value or 0) for key, value in row.items()},
+        }
+
 
 # Global instance
 usage_tracker = UsageTracker()
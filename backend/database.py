@@ -17,6 +17,8 @@ if DATABASE_URL.startswith("postgresql://"):
     # - max_overflow=10: additional connections under load (15 total max)
     # - pool_pre_ping=True: validates connections before use (handles Cloud SQL restarts)
     # - pool_recycle=1800: refresh connections every 30min (prevents stale connections)
+    # - executemany_mode="values_plus_batch": multi-row INSERTs become VALUES lists and
+    #   executemany UPDATEs (e.g. bulk photo result writes) go through execute_batch
     engine = create_engine(
         DATABASE_URL,
         pool_size=5,
@@ -24,6 +26,9 @@ if DATABASE_URL.startswith("postgresql://"):
         pool_timeout=30,
         pool_recycle=1800,
         pool_pre_ping=True,
+        executemany_mode="values_plus_batch",
+        insertmanyvalues_page_size=1000,
+        executemany_batch_page_size=500,
         connect_args={
             "sslmode": "require",
             "connect_timeout": 10,
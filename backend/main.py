@@ -28,11 +28,16 @@ from app.models import (  # Import models to register them with SQLAlchemy
 
 # Import database setup and models
 from database import create_tables, get_db_info, get_db
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 # Configure logger for this module
 logger = logging.getLogger(__name__)
 
+# Nightly analytics rollup runs once the previous UTC day has fully closed
+DAILY_ROLLUP_HOUR_UTC = 2
+# How often usage_hourly_rollup picks up new usage logs
+HOURLY_USAGE_ROLLUP_INTERVAL_SECONDS = 600
+
 # Simplified startup for Gemini Flash - no complex credential management needed
 
 # Security check for JWT
@@ -96,6 +101,62 @@ async def schedule_periodic_cleanup():
             # Continue the loop even if there's an error
 
 
+async def schedule_nightly_rollup():
+    """
+    Keep analytics_daily_rollup current: refresh once at startup, then
+    every night at DAILY_ROLLUP_HOUR_UTC after the previous day has closed.
+    """
+    from app.services.analytics_service import analytics_service
+    from database import SessionLocal
+
+    def run_rollup():
+        db = SessionLocal()
+        try:
+            return analytics_service.refresh_daily_rollups(db)
+        finally:
+            db.close()
+
+    while True:
+        try:
+            rolled_days = await asyncio.to_thread(run_rollup)
+            logger.info(f"📊 Analytics rollup refreshed {rolled_days} days")
+        except Exception as e:
+            logger.error(f"Analytics rollup failed: {e}")
+
+        now = datetime.now(timezone.utc)
+        next_run = now.replace(
+            hour=DAILY_ROLLUP_HOUR_UTC, minute=0, second=0, microsecond=0
+        )
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        await asyncio.sleep((next_run - now).total_seconds())
+
+
+async def schedule_hourly_usage_rollup():
+    """
+    Keep usage_hourly_rollup current: refresh at startup, then every
+    HOURLY_USAGE_ROLLUP_INTERVAL_SECONDS.
+    """
+    from app.services.analytics_service import analytics_service
+    from database import SessionLocal
+
+    def run_rollup():
+        db = SessionLocal()
+        try:
+            return analytics_service.refresh_hourly_usage_rollups(db)
+        finally:
+            db.close()
+
+    while True:
+        try:
+            buckets = await asyncio.to_thread(run_rollup)
+            logger.info(f"📊 Hourly usage rollup refreshed {buckets} buckets")
+        except Exception as e:
+            logger.error(f"Hourly usage rollup failed: {e}")
+
+        await asyncio.sleep(HOURLY_USAGE_ROLLUP_INTERVAL_SECONDS)
+
+
 # Add security headers middleware
 @app.middleware("http")
 async def add_security_headers_middleware(request: Request, call_next):
@@ -188,6 +249,31 @@ async def startup_event():
     import asyncio
 
     asyncio.create_task(schedule_periodic_cleanup())
+    asyncio.create_task(schedule_nightly_rollup())
+    asyncio.create_task(schedule_hourly_usage_rollup())
+
+    # Apply queued Stripe webhook events off the request path
+    from app.services.stripe_service import run_webhook_worker
+
+    asyncio.create_task(run_webhook_worker())
+
+    # Write buffered usage logs in batches
+    from app.services.usage_tracker import usage_tracker
+
+    asyncio.create_task(usage_tracker.run_log_flusher())
+
+    # Warm the Gemini connection in the background so startup isn't delayed
+    from app.api.process_tasks import detector
+
+    asyncio.create_task(detector.warm_up())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Write any usage logs still buffered when the server stops."""
+    from app.services.usage_tracker import usage_tracker
+
+    usage_tracker.flush_logs()
 
 
 # Configure CORS from settings
@@ -0,0 +1,24 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Register every model on Base.metadata before create_all
+import app.models.analytics  # noqa: F401
+import app.models.processing  # noqa: F401
+import app.models.usage  # noqa: F401
+import app.models.user  # noqa: F401
+from database import Base
+
+
+@pytest.fixture
+def session_factory():
+    """Sessionmaker bound to a fresh in-memory SQLite database shared across threads."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
@@ -0,0 +1,81 @@
+from datetime import date, datetime, timedelta, timezone
+
+from app.models.analytics import AnalyticsDailyRollup, UsageHourlyRollup
+from app.models.usage import ActionType, ProcessingJob, UsageLog
+from app.models.user import User
+from app.services.analytics_service import AnalyticsService
+from app.services.job_service import JobService
+
+NOW = datetime(2026, 10, 17, 12, 30, tzinfo=timezone.utc)
+
+
+def _log(user_id, hour, minute=0, photo_count=0):
+    return UsageLog(
+        user_id=user_id,
+        action_type=ActionType.UPLOAD,
+        photo_count=photo_count,
+        created_at=datetime(2026, 10, 17, hour, minute, tzinfo=timezone.utc),
+    )
+
+
+def test_hourly_refresh_overwrites_existing_buckets(session_factory):
+    db = session_factory()
+    try:
+        db.add_all([_log(1, 11, 5, photo_count=2), _log(1, 11, 40, photo_count=3)])
+        db.commit()
+        service = AnalyticsService()
+
+        assert service.refresh_hourly_usage_rollups(db, now=NOW) == 1
+        # A second refresh (e.g. from another instance) recomputes the same bucket
+        db.add(_log(1, 11, 50, photo_count=1))
+        db.commit()
+        assert service.refresh_hourly_usage_rollups(db, now=NOW) == 1
+
+        bucket = db.query(UsageHourlyRollup).one()
+        assert (bucket.actions, bucket.photos) == (3, 6)
+    finally:
+        db.close()
+
+
+def test_daily_rollup_rerun_overwrites_row(session_factory):
+    db = session_factory()
+    try:
+        service = AnalyticsService()
+        day = date(2026, 10, 16)
+
+        service.rollup_daily_analytics(db, day)
+        service.rollup_daily_analytics(db, day)
+
+        assert db.query(AnalyticsDailyRollup).filter_by(date=day).count() == 1
+    finally:
+        db.close()
+
+
+def test_report_totals_match_live_after_cleanup(session_factory):
+    db = session_factory()
+    try:
+        service = AnalyticsService()
+        now = datetime.now(timezone.utc)
+        old_day = now - timedelta(days=40)
+        user = User(email="runner@example.com", full_name="Runner", password_hash="x")
+        db.add(user)
+        db.flush()
+        db.add_all([
+            ProcessingJob(user_id=user.id, job_id="expired", total_photos=5,
+                          created_at=old_day, expires_at=now - timedelta(days=10)),
+            ProcessingJob(user_id=user.id, job_id="kept", total_photos=3,
+                          created_at=old_day),
+        ])
+        db.commit()
+        service.refresh_daily_rollups(db)
+        window = (now - timedelta(days=45), now)
+        assert service.get_period_totals(db, *window)["photos"] == 8
+
+        assert JobService().cleanup_expired_jobs(db) == 1
+
+        # Rolled-up and live paths agree once the expired job is gone
+        from_rollup = service.get_period_totals(db, *window)
+        assert from_rollup == service.get_window_totals(db, *window)
+        assert (from_rollup["jobs"], from_rollup["photos"]) == (1, 3)
+    finally:
+        db.close()
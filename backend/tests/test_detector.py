@@ -0,0 +1,23 @@
+import pytest
+
+from app.services.detector import NumberDetector
+
+
+@pytest.mark.parametrize(
+    "text, valid",
+    [
+        ("1", True),
+        ("99999", True),
+        ("000123", True),
+        ("0", False),
+        ("000000", False),
+        ("100000", False),
+        ("1234567", False),
+        ("", False),
+        ("12a", False),
+        ("١٢٣", False),  # Non-ASCII digits
+        ("12\n", False),
+    ],
+)
+def test_is_valid_bib_number(text, valid):
+    assert NumberDetector._is_valid_bib_number(None, text) is valid
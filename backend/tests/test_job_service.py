@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from app.models.processing import PhotoDB, ProcessingStatus
+from app.models.schemas import DetectionResult
+from app.models.usage import ProcessingJob
+from app.models.user import User
+from app.services import job_service
+from app.services.job_service import JobService
+
+JOB_ID = "job-1"
+PHOTO_IDS = [f"photo-{i}" for i in range(4)]
+
+
+class FakeDetector:
+    """Detects the photo index as the bib number; runs a hook before each call."""
+
+    def __init__(self, before_call=None):
+        self.before_call = before_call
+        self.calls = 0
+
+    async def process_photo_batch(self, photo_ids, debug_mode, user_id):
+        if self.before_call:
+            self.before_call(self.calls)
+        self.calls += 1
+        return {
+            photo_id: DetectionResult(bib_number=photo_id.split("-")[1], confidence=0.9)
+            for photo_id in photo_ids
+        }
+
+
+@pytest.fixture
+def job_db(session_factory, monkeypatch):
+    """A user, a pending job and its photos; process_job_async uses the test database."""
+    db = session_factory()
+    user = User(email="runner@example.com", full_name="Runner", password_hash="x")
+    db.add(user)
+    db.flush()
+    job = ProcessingJob(user_id=user.id, job_id=JOB_ID, total_photos=len(PHOTO_IDS))
+    db.add(job)
+    db.flush()
+    db.add_all(
+        PhotoDB(
+            photo_id=photo_id,
+            user_id=user.id,
+            processing_job_id=job.id,
+            original_filename=f"{photo_id}.jpg",
+            file_path=f"/tmp/{photo_id}.jpg",
+            file_size_bytes=1,
+            file_extension=".jpg",
+        )
+        for photo_id in PHOTO_IDS
+    )
+    db.commit()
+    db.close()
+
+    def get_test_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    monkeypatch.setattr(job_service, "get_db", get_test_db)
+    monkeypatch.setattr(job_service, "DETECTION_CHUNK_SIZE", 2)
+    return session_factory
+
+
+def _service(detector) -> JobService:
+    service = JobService.__new__(JobService)
+    service.detector = detector
+    service._active_jobs_cache = {}
+    return service
+
+
+def test_chunk_results_are_committed_with_progress(job_db):
+    observed = []
+
+    def check_previous_chunk(call_index):
+        if call_index == 0:
+            return
+        db = job_db()
+        try:
+            job = db.query(ProcessingJob).filter_by(job_id=JOB_ID).one()
+            stored = {
+                photo.photo_id: photo.detected_number
+                for photo in db.query(PhotoDB).filter(PhotoDB.detected_number.isnot(None))
+            }
+            observed.append((job.status, job.progress, stored))
+        finally:
+            db.close()
+
+    asyncio.run(_service(FakeDetector(check_previous_chunk)).process_job_async(JOB_ID))
+
+    # When the second chunk starts, the first chunk's results are stored and the
+    # job is still processing
+    assert observed == [
+        (ProcessingStatus.PROCESSING, 50, {"photo-0": "0", "photo-1": "1"}),
+    ]
+
+    db = job_db()
+    try:
+        job = db.query(ProcessingJob).filter_by(job_id=JOB_ID).one()
+        assert job.status == ProcessingStatus.COMPLETED
+        assert job.progress == 100
+        assert {
+            photo.photo_id: photo.detected_number for photo in db.query(PhotoDB)
+        } == {"photo-0": "0", "photo-1": "1", "photo-2": "2", "photo-3": "3"}
+    finally:
+        db.close()
+
+
+def test_job_failure_keeps_finished_chunks(job_db, monkeypatch):
+    service = _service(FakeDetector())
+    original_update = service.update_job_progress
+
+    def fail_after_first_chunk(db, job_id, progress, completed_photos):
+        if completed_photos > 2:
+            raise RuntimeError("database connection lost")
+        original_update(db, job_id, progress, completed_photos)
+
+    monkeypatch.setattr(service, "update_job_progress", fail_after_first_chunk)
+    asyncio.run(service.process_job_async(JOB_ID))
+
+    db = job_db()
+    try:
+        job = db.query(ProcessingJob).filter_by(job_id=JOB_ID).one()
+        assert job.status == ProcessingStatus.FAILED
+        stored = {
+            photo.photo_id
+            for photo in db.query(PhotoDB).filter(PhotoDB.detected_number.isnot(None))
+        }
+        assert stored == {"photo-0", "photo-1"}
+    finally:
+        db.close()
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from app.models.user import StripeWebhookEvent
+from app.services import stripe_service
+
+EVENT_ID = "evt_test_1"
+
+
+def _event_payload() -> bytes:
+    return json.dumps({
+        "id": EVENT_ID,
+        "type": "customer.subscription.deleted",
+        "data": {"object": {"customer": "cus_test"}},
+    }).encode()
+
+
+@pytest.fixture(autouse=True)
+def webhook_env(monkeypatch, session_factory):
+    """Route the service at the test database and skip signature checks."""
+    monkeypatch.setattr(stripe_service, "SessionLocal", session_factory)
+    monkeypatch.setattr(stripe_service, "WEBHOOK_SECRET", "whsec_test")
+    monkeypatch.setattr(
+        stripe_service.stripe.Webhook,
+        "construct_event",
+        lambda payload, sig_header, secret: json.loads(payload),
+    )
+    stripe_service._webhook_pending.clear()
+    while not stripe_service._webhook_queue.empty():
+        stripe_service._webhook_queue.get_nowait()
+    yield
+    stripe_service._webhook_pending.clear()
+
+
+def _deliver(session_factory):
+    db = session_factory()
+    try:
+        return stripe_service.handle_webhook_event(db, _event_payload(), "sig")
+    finally:
+        db.close()
+
+
+def _stored_event(session_factory) -> StripeWebhookEvent:
+    db = session_factory()
+    try:
+        return db.query(StripeWebhookEvent).filter_by(event_id=EVENT_ID).one()
+    finally:
+        db.close()
+
+
+def test_event_is_stored_and_queued(session_factory):
+    assert _deliver(session_factory) == ("queued", 200)
+
+    assert stripe_service._webhook_queue.get_nowait() == EVENT_ID
+    event = _stored_event(session_factory)
+    assert event.processed_at is None
+    assert json.loads(event.payload)["id"] == EVENT_ID
+
+
+def test_redelivery_after_failed_processing_is_retried(session_factory, monkeypatch):
+    _deliver(session_factory)
+    stripe_service._webhook_pending.clear()
+
+    def fail(db, event_type, data):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(stripe_service, "_process_webhook_event", fail)
+    stripe_service._apply_webhook_event(EVENT_ID)
+
+    event = _stored_event(session_factory)
+    assert event.processed_at is None
+    assert event.attempts == 1
+
+    # Stripe's redelivery must not be swallowed as a duplicate
+    assert _deliver(session_factory) == ("queued", 200)
+    assert EVENT_ID in stripe_service._webhook_pending
+
+
+def test_redelivery_after_success_is_skipped(session_factory, monkeypatch):
+    _deliver(session_factory)
+    applied = []
+    monkeypatch.setattr(
+        stripe_service,
+        "_process_webhook_event",
+        lambda db, event_type, data: applied.append((event_type, data)) or ("ok", 200),
+    )
+    stripe_service._apply_webhook_event(EVENT_ID)
+
+    assert applied == [("customer.subscription.deleted", {"customer": "cus_test"})]
+    assert _stored_event(session_factory).processed_at is not None
+
+    stripe_service._webhook_pending.clear()
+    assert _deliver(session_factory) == ("Already received", 200)
+    assert EVENT_ID not in stripe_service._webhook_pending
+
+
+def test_sweep_finds_unapplied_events(session_factory, monkeypatch):
+    _deliver(session_factory)
+    monkeypatch.setattr(stripe_service, "WEBHOOK_RETRY_MIN_AGE_SECONDS", -60)
+
+    assert stripe_service._find_unapplied_webhook_events() == [EVENT_ID]
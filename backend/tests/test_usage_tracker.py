@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from app.models.usage import ActionType, UsageLog
+from app.services import usage_tracker as usage_tracker_module
+from app.services.usage_tracker import UsageTracker
+
+
+@pytest.fixture
+def tracker(session_factory, monkeypatch):
+    monkeypatch.setattr(usage_tracker_module, "SessionLocal", session_factory)
+    return UsageTracker()
+
+
+def _failing_inserts(session_factory):
+    """Session factory whose sessions reject every statement."""
+
+    class FailingSession:
+        def __init__(self):
+            self.session = session_factory()
+
+        def execute(self, *args, **kwargs):
+            raise RuntimeError("connection reset")
+
+        def __getattr__(self, name):
+            return getattr(self.session, name)
+
+    return FailingSession
+
+
+def _stored_user_ids(session_factory):
+    db = session_factory()
+    try:
+        return [log.user_id for log in db.query(UsageLog).order_by(UsageLog.id)]
+    finally:
+        db.close()
+
+
+def test_flush_writes_buffered_rows(tracker, session_factory):
+    tracker.log_action(None, user_id=1, action_type=ActionType.UPLOAD, photo_count=3)
+    tracker.log_action(None, user_id=2, action_type=ActionType.LOGIN)
+
+    assert tracker.flush_logs() == 2
+    assert _stored_user_ids(session_factory) == [1, 2]
+    assert tracker.flush_logs() == 0
+
+
+def test_failed_flush_requeues_rows_in_order(tracker, session_factory, monkeypatch):
+    tracker.log_action(None, user_id=1, action_type=ActionType.UPLOAD)
+
+    def unavailable():
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(usage_tracker_module, "SessionLocal", unavailable)
+    assert tracker.flush_logs() == 0
+
+    # Then the INSERT itself fails
+    monkeypatch.setattr(usage_tracker_module, "SessionLocal", _failing_inserts(session_factory))
+    tracker.log_action(None, user_id=2, action_type=ActionType.LOGIN)
+    assert tracker.flush_logs() == 0
+
+    monkeypatch.setattr(usage_tracker_module, "SessionLocal", session_factory)
+    tracker.log_action(None, user_id=3, action_type=ActionType.EXPORT)
+    assert tracker.flush_logs() == 3
+    assert _stored_user_ids(session_factory) == [1, 2, 3]
+
+
+def test_failed_flush_caps_buffer(tracker, monkeypatch, session_factory):
+    monkeypatch.setattr(usage_tracker_module, "USAGE_LOG_BUFFER_MAX_ROWS", 2)
+
+    monkeypatch.setattr(usage_tracker_module, "SessionLocal", _failing_inserts(session_factory))
+    for user_id in (1, 2, 3):
+        tracker.log_action(None, user_id=user_id, action_type=ActionType.LOGIN)
+    tracker.flush_logs()
+
+    assert [row["user_id"] for row in tracker._log_buffer] == [2, 3]
+
+
+def test_cancelled_flusher_writes_remaining_rows(tracker, session_factory):
+    async def run():
+        task = asyncio.create_task(tracker.run_log_flusher())
+        await asyncio.sleep(0)
+        tracker.log_action(None, user_id=7, action_type=ActionType.LOGIN)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert _stored_user_ids(session_factory) == [7]
+
+
+def test_update_processing_job_returns_current_values(tracker, session_factory):
+    db = session_factory()
+    try:
+        tracker.create_processing_job(db, user_id=1, job_id="job-1", total_photos=10)
+        updates = {"progress": 40, "status": "processing", "not_a_column": 1}
+
+        result = tracker.update_processing_job(db, job_id="job-1", **updates)
+
+        assert result["progress"] == 40
+        assert result["status"] == "processing"
+        # The caller's kwargs are left untouched
+        assert updates == {"progress": 40, "status": "processing", "not_a_column": 1}
+        assert tracker.update_processing_job(db, job_id="missing", progress=1) is None
+    finally:
+        db.close()